@@ -1,16 +1,47 @@
+# 包入口保持轻量：Home Assistant 相关模块只在设置条目时导入，
+# 这样协议客户端（gf_client、protocol、devices 等）可以脱离 HA 单独导入使用
+from __future__ import annotations
+
 import asyncio
 import logging
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from .gf_client import GfClient
+import time
+from typing import TYPE_CHECKING
+from .capture import ProtocolCapture
+from .const import (
+    ATTR_HANGER_IDS,
+    ATTR_OPERATION,
+    CONF_CAPTURE,
+    CONF_TRACE_FRAMES,
+    CONF_TRACE_SAMPLE,
+    DOMAIN,
+    HOST,
+    OPERATIONS,
+    PORT,
+    SERVICE_CONTROL_MANY,
+)
+from .pool import get_pool
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant, ServiceCall
 
 _LOGGER = logging.getLogger(__name__)
 
-# 假设 host 和 port 在这里硬编码，实际可根据需求调整
-HOST = "main.ortron.cn"
-PORT = 13015
+PLATFORMS = ["cover", "sensor"]
+
+# 首次设置（无设备缓存）时等待登录完成的时间（秒）
+SETUP_TIMEOUT = 60
+
+# 设备列表缓存的存储版本
+STORAGE_VERSION = 1
+# 设备增删后延迟写回缓存的时间（秒），合并短时间内的多次变化
+CACHE_SAVE_DELAY = 1
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
+    from homeassistant.exceptions import ConfigEntryAuthFailed, ConfigEntryNotReady
+    from homeassistant.helpers.storage import Store
+
     if entry.domain != "gofullhanger":
         return False
 
@@ -22,71 +53,155 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
         _LOGGER.error("配置信息不完整，请检查mobile、password和clientid配置")
         return False
 
-    max_retries = 3
-    client = None
-    
-    for attempt in range(max_retries):
-        try:
-            if client is not None:
-                await client.close()
-                client = None
-            
-            client = GfClient(HOST, PORT, hass, max_retries=3)
-            
-            _LOGGER.info(f"尝试连接Gf Hanger服务器 (第{attempt + 1}次尝试)...")
-            
-            connected = await client.connect()
-            if not connected:
-                _LOGGER.warning(f"连接失败，将在{2 ** attempt}秒后重试")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(2 ** attempt)
-                    continue
-                else:
-                    _LOGGER.error("达到最大重试次数，连接失败")
-                    return False
-
-            logged_in = await client.login(mobile, password, clientid)
-            if not logged_in:
-                _LOGGER.warning(f"登录失败，将在{2 ** attempt}秒后重试")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(2 ** attempt)
-                    continue
-                else:
-                    _LOGGER.error("达到最大重试次数，登录失败")
-                    return False
-
-            hass.data.setdefault(entry.entry_id, {})
-            hass.data[entry.entry_id]["client"] = client
-
-            await hass.config_entries.async_forward_entry_setups(entry, ["cover"])
-            
-            _LOGGER.info("Gf Hanger集成设置成功")
-            return True
-            
-        except asyncio.TimeoutError:
-            _LOGGER.warning(f"设置超时，将在{2 ** attempt}秒后重试")
-            if attempt < max_retries - 1:
-                await asyncio.sleep(2 ** attempt)
-                continue
-            else:
-                _LOGGER.error("达到最大重试次数，设置超时")
-                return False
-                
-        except Exception as e:
-            _LOGGER.error(f"设置Gf Hanger时出错 (第{attempt + 1}次尝试): {e}")
-            if attempt < max_retries - 1:
-                await asyncio.sleep(2 ** attempt)
-                continue
-            else:
-                _LOGGER.error("达到最大重试次数，设置失败")
-                return False
+    # 同一账号的多个条目共用连接池中的同一个已登录会话，
+    # 配置流程验证账号时登录的会话也在池中，直接接管它的引用
+    lease = get_pool(hass).acquire(
+        HOST, PORT, mobile, password, clientid, adopt=True, max_retries=3,
+        trace_capacity=entry.options.get(CONF_TRACE_FRAMES, 0),
+        trace_sample_every=entry.options.get(CONF_TRACE_SAMPLE, 1),
+    )
+    client = lease.client
+    if lease.refs > 1:
+        _LOGGER.info(f"账号已有连接，与其他 {lease.refs - 1} 个条目共用")
+
+    if entry.options.get(CONF_CAPTURE) and client.capture is None:
+        path = hass.config.path(f"{DOMAIN}_{time.strftime('%Y%m%d_%H%M%S')}.gfcap")
+        client.capture = await hass.async_add_executor_job(ProtocolCapture.open, path)
+        _LOGGER.warning(f"协议抓包已开启，写入 {path}")
+
+    # 先用上次保存的设备列表建立实体，连接和登录放到后台完成
+    store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}.devices")
+    cached = await store.async_load()
+    if cached and not client.devices:
+        client.load_devices(cached.get("devices", []))
+
+    hass.data.setdefault(entry.entry_id, {})
+    hass.data[entry.entry_id]["client"] = client
+    hass.data[entry.entry_id]["store"] = store
+    hass.data[entry.entry_id]["lease"] = lease
+    hass.data[entry.entry_id]["commands"] = lease.commands
+
+    # 账号或密码被拒绝时客户端停止重连，由重新验证流程让用户更新密码
+    entry.async_on_unload(client.add_login_rejected_listener(lambda: entry.async_start_reauth(hass)))
+
+    if client.devices:
+        _LOGGER.info(f"使用缓存的 {len(client.devices)} 台设备建立实体，后台连接服务器")
+        entry.async_create_background_task(
+            hass, _async_start_client(client, store, mobile, password, clientid), "gofullhanger_connect"
+        )
+    elif not await _async_start_client(client, store, mobile, password, clientid, SETUP_TIMEOUT):
+        # 首次设置没有缓存，交给 HA 在后台按退避重试
+        if await get_pool(hass).release(lease):
+            await _async_close_capture(hass, client)
+        hass.data.pop(entry.entry_id)
+        if client.login_rejected:
+            raise ConfigEntryAuthFailed("Gf Hanger服务器拒绝了账号或密码")
+        raise ConfigEntryNotReady("无法连接或登录Gf Hanger服务器")
+
+    # 后续 onHomeInfo 带来的设备增删写回缓存，下次启动按最新的设备列表建立实体
+    entry.async_on_unload(client.add_devices_listener(
+        lambda added, removed: store.async_delay_save(lambda: {"devices": client.devices_info}, CACHE_SAVE_DELAY)
+    ))
+
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    _async_register_services(hass)
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
+
+    _LOGGER.info("Gf Hanger集成设置成功")
+    return True
+
 
-    return False
+async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry):
+    # 选项变化（如协议追踪设置）后重新加载
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
+async def _async_start_client(client, store, mobile, password, clientid, timeout=None):
+    # 连接、登录以及断线后的退避重连都由客户端的连接监督任务负责
+    _LOGGER.info("连接Gf Hanger服务器...")
+    client.start(mobile, password, clientid)
+    if not await client.wait_for_session(timeout):
+        _LOGGER.error("未能登录Gf Hanger服务器")
+        return False
+
+    await store.async_save({"devices": client.devices_info})
+    return True
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
-    unload_ok = await hass.config_entries.async_unload_platforms(entry, ["cover"])
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
-        client = hass.data[entry.entry_id]["client"]
-        client.close()
-        hass.data.pop(entry.entry_id)
+        entry_data = hass.data.pop(entry.entry_id)
+        # 引用归零时才真正关闭共享连接，并等待关闭完成
+        if await get_pool(hass).release(entry_data["lease"]):
+            await _async_close_capture(hass, entry_data["client"])
+        if not any(e.entry_id in hass.data for e in hass.config_entries.async_entries(DOMAIN)):
+            hass.services.async_remove(DOMAIN, SERVICE_CONTROL_MANY)
     return unload_ok
+
+
+async def _async_close_capture(hass: HomeAssistant, client):
+    capture, client.capture = client.capture, None
+    if capture is not None:
+        await hass.async_add_executor_job(capture.close)
+        _LOGGER.info(f"协议抓包已关闭，共 {capture.records} 条记录")
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry):
+    from homeassistant.helpers.storage import Store
+
+    # 删除配置条目时一并删除设备列表缓存
+    await Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}.devices").async_remove()
+
+
+def _async_register_services(hass: HomeAssistant):
+    import voluptuous as vol
+    from homeassistant.core import SupportsResponse
+    import homeassistant.helpers.config_validation as cv
+
+    if hass.services.has_service(DOMAIN, SERVICE_CONTROL_MANY):
+        return
+
+    async def async_control_many(call: ServiceCall):
+        operation_code = OPERATIONS[call.data[ATTR_OPERATION]]
+        device_ids = call.data.get(ATTR_HANGER_IDS)
+
+        # 按连接分组，每个连接批量下发一次；共用连接的条目只下发一次
+        batches = []
+        clients = set()
+        for entry in hass.config_entries.async_entries(DOMAIN):
+            entry_data = hass.data.get(entry.entry_id)
+            if not entry_data or id(entry_data["client"]) in clients:
+                continue
+            client = entry_data["client"]
+            clients.add(id(client))
+            targets = [
+                device_id for device_id in (device_ids or client.devices)
+                if device_id in client.devices
+            ]
+            if targets:
+                batches.append(client.control_many(
+                    entry.data.get("mobile"),
+                    entry.data.get("password"),
+                    entry.data.get("clientid"),
+                    [(device_id, operation_code) for device_id in targets],
+                ))
+
+        results = {}
+        for batch_result in await asyncio.gather(*batches):
+            results.update(batch_result)
+        for device_id in device_ids or ():
+            if device_id not in results:
+                _LOGGER.error(f"批量控制时未找到设备: {device_id}")
+                results[device_id] = False
+        return {"results": results}
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_CONTROL_MANY,
+        async_control_many,
+        schema=vol.Schema({
+            vol.Required(ATTR_OPERATION): vol.In(OPERATIONS),
+            vol.Optional(ATTR_HANGER_IDS): vol.All(cv.ensure_list, [cv.string]),
+        }),
+        supports_response=SupportsResponse.OPTIONAL,
+    )
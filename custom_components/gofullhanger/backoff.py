@@ -0,0 +1,29 @@
+import random
+
+
+class Backoff:
+    """带随机抖动的指数退避。
+
+    第 n 次调用 next() 返回 min(maximum, initial * factor ** n)，再随机缩短
+    至多 jitter 比例，避免多个客户端在服务器恢复后同时重连。
+    """
+
+    def __init__(self, initial=1.0, maximum=300.0, factor=2.0, jitter=0.5, rand=random.random):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self._random = rand
+        self.attempts = 0
+        self._delay = initial
+
+    def next(self):
+        delay = min(self._delay, self.maximum)
+        self.attempts += 1
+        if self._delay < self.maximum:
+            self._delay *= self.factor
+        return delay * (1 - self.jitter * self._random())
+
+    def reset(self):
+        self.attempts = 0
+        self._delay = self.initial
@@ -0,0 +1,78 @@
+import queue
+import struct
+import threading
+import time
+
+from .trace import DIRECTION_IN, DIRECTION_OUT
+
+# 抓包文件：文件头为魔数和抓包开始的 Unix 时间，之后是连续的记录，
+# 每条记录为 方向(1 字节) + 相对开始的秒数(double) + 长度(uint32) + 原始字节
+CAPTURE_MAGIC = b"GFCAP\x01"
+_HEADER = struct.Struct(">d")
+_RECORD = struct.Struct(">BdI")
+
+_DIRECTION_CODES = {DIRECTION_IN: 0, DIRECTION_OUT: 1}
+_DIRECTIONS = {code: direction for direction, code in _DIRECTION_CODES.items()}
+
+
+class ProtocolCapture:
+    """把收发的原始字节流连同时间戳写入抓包文件。
+
+    入站记录保持 socket 读取时的分片原样，回放时可以重现分片和垃圾字节；
+    含敏感信息的出站帧（如登录请求）只保留帧头。
+
+    record 在事件循环中只把记录放入队列，文件写入由后台写入线程完成，
+    事件循环不会因磁盘 I/O 或缓冲区刷新而阻塞。
+    """
+
+    def __init__(self, file):
+        self._file = file
+        self._started = time.monotonic()
+        self.records = 0
+        self._queue = queue.SimpleQueue()
+        file.write(CAPTURE_MAGIC + _HEADER.pack(time.time()))
+        self._writer = threading.Thread(target=self._write_loop, name="gofullhanger_capture", daemon=True)
+        self._writer.start()
+
+    @classmethod
+    def open(cls, path):
+        return cls(open(path, "wb", buffering=65536))
+
+    def record(self, direction, data, redact=False):
+        payload = bytes(data[:4]) if redact else bytes(data)
+        header = _RECORD.pack(_DIRECTION_CODES[direction], time.monotonic() - self._started, len(payload))
+        self._queue.put(header + payload)
+        self.records += 1
+
+    def _write_loop(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                break
+            self._file.write(record)
+        self._file.close()
+
+    def close(self):
+        """写完队列中的记录后关闭文件，会阻塞到写入线程结束，应在执行器中调用。"""
+        self._queue.put(None)
+        self._writer.join()
+
+
+def read_capture(path):
+    """读取抓包文件，返回 (开始时间, [(方向, 相对秒数, 原始字节), ...])。"""
+    with open(path, "rb") as f:
+        if f.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise ValueError(f"不是有效的抓包文件: {path}")
+        started, = _HEADER.unpack(f.read(_HEADER.size))
+        records = []
+        while True:
+            header = f.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                break
+            code, offset, length = _RECORD.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                # 客户端异常退出时最后一条记录可能不完整
+                break
+            records.append((_DIRECTIONS[code], offset, data))
+    return started, records
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+
+from .const import COMMAND_COALESCE_WINDOW, OPERATION_STOP
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _DeviceCommands:
+    __slots__ = ("in_flight", "in_flight_operation", "pending", "pending_operation", "last_sent", "drain_task")
+
+    def __init__(self):
+        self.in_flight = None
+        self.in_flight_operation = None
+        self.pending = None
+        self.pending_operation = None
+        self.last_sent = None
+        self.drain_task = None
+
+
+class CommandCoalescer:
+    """按设备合并短时间内的连续控制命令。
+
+    设备空闲时命令立即发送；窗口期内或上一条命令未完成时，后续命令进入
+    该设备唯一的待发槽位，后到的命令覆盖先到的命令，相同命令合并等待。
+    stop 总是立即发送，并取代仍在待发槽位中的命令。
+    """
+
+    def __init__(self, send, window=COMMAND_COALESCE_WINDOW):
+        self._send = send
+        self.window = window
+        self._devices = {}
+
+    async def submit(self, device_id, operation_code):
+        state = self._devices.get(device_id)
+        if state is None:
+            state = self._devices[device_id] = _DeviceCommands()
+        loop = asyncio.get_running_loop()
+
+        busy = state.in_flight is not None and not state.in_flight.done()
+
+        if operation_code == OPERATION_STOP:
+            if busy and state.in_flight_operation == OPERATION_STOP and state.pending is None:
+                return await asyncio.shield(state.in_flight)
+            superseded = self._take_pending(state)
+            future = self._dispatch(device_id, state, operation_code)
+            if superseded is not None:
+                _LOGGER.debug("设备 %s 的待发命令被 stop 取代", device_id)
+                self._chain(future, superseded)
+            return await asyncio.shield(future)
+
+        if state.pending is not None:
+            if state.pending_operation != operation_code:
+                _LOGGER.debug("设备 %s 的待发命令 %s 被 %s 覆盖", device_id, state.pending_operation, operation_code)
+                state.pending_operation = operation_code
+            return await asyncio.shield(state.pending)
+
+        if busy and state.in_flight_operation == operation_code:
+            # 与正在执行的命令相同，直接等待它的结果
+            return await asyncio.shield(state.in_flight)
+
+        if not busy and (state.last_sent is None or loop.time() - state.last_sent >= self.window):
+            return await asyncio.shield(self._dispatch(device_id, state, operation_code))
+
+        state.pending = loop.create_future()
+        state.pending_operation = operation_code
+        state.drain_task = asyncio.create_task(self._drain(device_id, state))
+        return await asyncio.shield(state.pending)
+
+    def cancel(self):
+        for state in self._devices.values():
+            pending = self._take_pending(state)
+            if pending is not None and not pending.done():
+                pending.cancel()
+
+    def _take_pending(self, state):
+        pending = state.pending
+        state.pending = None
+        state.pending_operation = None
+        if state.drain_task is not None and state.drain_task is not asyncio.current_task():
+            state.drain_task.cancel()
+        state.drain_task = None
+        return pending
+
+    def _dispatch(self, device_id, state, operation_code):
+        state.last_sent = asyncio.get_running_loop().time()
+        task = asyncio.create_task(self._send(device_id, operation_code))
+        state.in_flight = task
+        state.in_flight_operation = operation_code
+        return task
+
+    async def _drain(self, device_id, state):
+        loop = asyncio.get_running_loop()
+        while True:
+            delay = state.last_sent + self.window - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif state.in_flight is not None and not state.in_flight.done():
+                await asyncio.wait((state.in_flight,))
+            else:
+                break
+        operation_code = state.pending_operation
+        pending = self._take_pending(state)
+        previous = state.in_flight
+        if (previous is not None and state.in_flight_operation == operation_code
+                and not previous.cancelled() and previous.exception() is None):
+            # 覆盖后的最终命令与刚执行完的命令相同，无需再请求一次
+            self._chain(previous, pending)
+            return
+        self._chain(self._dispatch(device_id, state, operation_code), pending)
+
+    @staticmethod
+    def _chain(source, target):
+        def copy_result(done):
+            if target.done():
+                return
+            if done.cancelled():
+                target.cancel()
+            elif done.exception() is not None:
+                target.set_exception(done.exception())
+            else:
+                target.set_result(done.result())
+
+        source.add_done_callback(copy_result)
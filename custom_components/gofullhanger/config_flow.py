@@ -1,12 +1,65 @@
+import asyncio
+
 import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.core import callback
+from .const import (
+    CONF_CAPTURE,
+    CONF_STATE_WRITE_INTERVAL,
+    CONF_TRACE_FRAMES,
+    CONF_TRACE_SAMPLE,
+    HOST,
+    LOGIN_CHECK_TIMEOUT,
+    PORT,
+    SESSION_HANDOFF_TIMEOUT,
+    STATE_WRITE_INTERVAL,
+)
+from .gf_client import GfClient
+from .pool import get_pool
+
+
+async def _async_try_login(client, mobile, password, clientid):
+    """握手并登录一次，成功返回 None，失败返回表单错误键。"""
+    try:
+        if await asyncio.wait_for(client.login(mobile, password, clientid), LOGIN_CHECK_TIMEOUT):
+            return None
+    except asyncio.TimeoutError:
+        return "cannot_connect"
+    return "invalid_auth" if client.login_rejected else "cannot_connect"
+
+
+async def _async_validate_login(hass, mobile, password, clientid):
+    """验证账号；登录成功的会话留在连接池中，由随后的条目设置直接接管。"""
+    pool = get_pool(hass)
+    lease = pool.acquire(HOST, PORT, mobile, password, clientid, max_retries=3)
+    if lease.refs > 1:
+        # 该账号已有条目在用的会话，用临时连接验证，不打扰现有会话
+        client = GfClient(HOST, PORT)
+        error = await _async_try_login(client, mobile, password, clientid)
+        await client.close()
+        await pool.release(lease)
+        return error
+
+    error = await _async_try_login(lease.client, mobile, password, clientid)
+    if error:
+        await pool.release(lease)
+    else:
+        pool.hand_off(hass, lease, SESSION_HANDOFF_TIMEOUT)
+    return error
+
 
 class GfHangerConfigFlow(config_entries.ConfigFlow, domain="gofullhanger"):
     VERSION = 1
 
     async def async_step_user(self, user_input=None):
+        errors = {}
         if user_input is not None:
+            error = await _async_validate_login(
+                self.hass, user_input["mobile"], user_input["password"], user_input["clientid"]
+            )
+            if error:
+                errors["base"] = error
+        if user_input is not None and not errors:
             return self.async_create_entry(
                 title="Gf Hanger",
                 data={
@@ -23,6 +76,36 @@ class GfHangerConfigFlow(config_entries.ConfigFlow, domain="gofullhanger"):
                 vol.Required("password"): str,
                 vol.Required("clientid"): str,
             }),
+            errors=errors,
+        )
+
+    async def async_step_reauth(self, entry_data):
+        # 服务器拒绝了保存的密码，请用户重新输入
+        self._reauth_entry = self.hass.config_entries.async_get_entry(self.context["entry_id"])
+        return await self.async_step_reauth_confirm()
+
+    async def async_step_reauth_confirm(self, user_input=None):
+        errors = {}
+        entry = self._reauth_entry
+        if user_input is not None:
+            # 只做验证，不接管会话；条目重新加载后由连接池按新密码登录
+            client = GfClient(HOST, PORT)
+            error = await _async_try_login(client, entry.data["mobile"], user_input["password"], entry.data["clientid"])
+            await client.close()
+            if error:
+                errors["base"] = error
+            else:
+                self.hass.config_entries.async_update_entry(
+                    entry, data={**entry.data, "password": user_input["password"]}
+                )
+                await self.hass.config_entries.async_reload(entry.entry_id)
+                return self.async_abort(reason="reauth_successful")
+
+        return self.async_show_form(
+            step_id="reauth_confirm",
+            data_schema=vol.Schema({vol.Required("password"): str}),
+            description_placeholders={"mobile": entry.data["mobile"]},
+            errors=errors,
         )
 
     @staticmethod
@@ -35,21 +118,52 @@ class GfHangerOptionsFlowHandler(config_entries.OptionsFlow):
         self._config_entry = config_entry
 
     async def async_step_init(self, user_input=None):
+        errors = {}
         if user_input is not None:
-            return self.async_create_entry(
-                title="",
-                data={
-                    "mobile": user_input["mobile"],
-                    "password": user_input["password"],
-                    "clientid": user_input["clientid"],
-                },
-            )
+            credentials = {key: user_input[key] for key in ("mobile", "password", "clientid")}
+            changed = credentials != {key: self._config_entry.data.get(key) for key in credentials}
+            if changed:
+                # 账号信息有改动时先验证，只做检查，不接管会话
+                client = GfClient(HOST, PORT)
+                error = await _async_try_login(client, *credentials.values())
+                await client.close()
+                if error:
+                    errors["base"] = error
+        if user_input is not None and not errors:
+            options = {
+                CONF_TRACE_FRAMES: user_input.get(CONF_TRACE_FRAMES, 0),
+                CONF_TRACE_SAMPLE: user_input.get(CONF_TRACE_SAMPLE, 1),
+                CONF_STATE_WRITE_INTERVAL: user_input.get(CONF_STATE_WRITE_INTERVAL, STATE_WRITE_INTERVAL),
+                CONF_CAPTURE: user_input.get(CONF_CAPTURE, False),
+            }
+            if changed:
+                # 条目设置从 entry.data 读取账号，账号写回 data，选项里只保留真正的选项；
+                # 两者一次写入，只触发一次重新加载
+                self.hass.config_entries.async_update_entry(
+                    self._config_entry, data={**self._config_entry.data, **credentials}, options=options
+                )
+            return self.async_create_entry(title="", data=options)
 
+        options = self._config_entry.options
         return self.async_show_form(
             step_id="init",
             data_schema=vol.Schema({
                 vol.Required("mobile", default=self._config_entry.data.get("mobile")): str,
                 vol.Required("password", default=self._config_entry.data.get("password")): str,
                 vol.Required("clientid", default=self._config_entry.data.get("clientid")): str,
+                # 协议帧追踪：保留最近多少帧（0 为关闭）以及每隔多少帧采样一次；
+                # 入站数据帧只记录帧头、序号和路由，不含家庭与设备信息
+                vol.Optional(CONF_TRACE_FRAMES, default=options.get(CONF_TRACE_FRAMES, 0)):
+                    vol.All(vol.Coerce(int), vol.Range(min=0, max=10000)),
+                vol.Optional(CONF_TRACE_SAMPLE, default=options.get(CONF_TRACE_SAMPLE, 1)):
+                    vol.All(vol.Coerce(int), vol.Range(min=1, max=1000)),
+                # 运动期间同一实体两次状态写入的最小间隔（秒）
+                vol.Optional(
+                    CONF_STATE_WRITE_INTERVAL,
+                    default=options.get(CONF_STATE_WRITE_INTERVAL, STATE_WRITE_INTERVAL),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0, max=10)),
+                # 把收发的原始字节流抓包写入配置目录，供 tools/replay.py 离线回放
+                vol.Optional(CONF_CAPTURE, default=options.get(CONF_CAPTURE, False)): bool,
             }),
+            errors=errors,
         )
@@ -1,6 +1,42 @@
 # custom_components/gf_cover/const.py
 DOMAIN = "gofullhanger"
 
+# 格峰云端服务器地址
+HOST = "main.ortron.cn"
+PORT = 13015
+
+# 配置流程验证账号时一次握手和登录的超时（秒）
+LOGIN_CHECK_TIMEOUT = 10
+# 配置流程登录的会话在连接池中保留多久等待条目设置接管（秒）
+SESSION_HANDOFF_TIMEOUT = 60
+
 CONF_MOBILE = "mobile"
 CONF_PASSWORD = "password"
 CONF_CLIENTID = "clientid"
+CONF_TRACE_FRAMES = "trace_frames"
+CONF_TRACE_SAMPLE = "trace_sample"
+CONF_STATE_WRITE_INTERVAL = "state_write_interval"
+CONF_CAPTURE = "capture"
+
+# 晾衣架控制操作码，对应 remoteControll 的 putDown / raiseUp / stop
+OPERATION_PUT_DOWN = 1
+OPERATION_RAISE_UP = 2
+OPERATION_STOP = 3
+
+# 同一设备连续命令的合并窗口（秒）
+COMMAND_COALESCE_WINDOW = 0.3
+
+# 同一实体两次状态写入之间的最小间隔（秒），0 表示每个事件循环 tick 至多写一次。
+# 云端推送通常相隔数百毫秒到达，间隔为 0 时几乎不会被合并
+STATE_WRITE_INTERVAL = 1.0
+
+# 批量控制服务
+SERVICE_CONTROL_MANY = "control_many"
+# 目标晾衣架的 _id 列表；不用 device_id，它是 HA 保留给设备注册表 ID 的目标字段
+ATTR_HANGER_IDS = "hanger_ids"
+ATTR_OPERATION = "operation"
+OPERATIONS = {
+    "put_down": OPERATION_PUT_DOWN,
+    "raise_up": OPERATION_RAISE_UP,
+    "stop": OPERATION_STOP,
+}
@@ -8,96 +8,263 @@ from homeassistant.components.cover import (
 )
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.restore_state import RestoreEntity
+from .const import (
+    CONF_STATE_WRITE_INTERVAL,
+    OPERATION_PUT_DOWN,
+    OPERATION_RAISE_UP,
+    OPERATION_STOP,
+    STATE_WRITE_INTERVAL,
+)
 from .gf_client import GfClient
+from .motion import (
+    DIRECTION_CLOSING,
+    DIRECTION_OPENING,
+    POSITION_CLOSED,
+    POSITION_OPEN,
+    MotionModel,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
+# 运动期间刷新估算位置的间隔（秒）
+MOTION_UPDATE_INTERVAL = 1.0
+
+# 学习到的全程开、关时间，作为状态属性保存以便重启后恢复
+ATTR_OPEN_TIME = "open_time"
+ATTR_CLOSE_TIME = "close_time"
+
 
 async def async_setup_entry(
         hass: HomeAssistant, entry: ConfigEntry, async_add_entities
 ):
     client = hass.data[entry.entry_id]["client"]
-    entities = []
-    for device_info in client.devices_info:
-        entities.append(GfCover(hass,device_info, client, entry.data))
-    async_add_entities(entities)
+    commands = hass.data[entry.entry_id]["commands"]
+    write_interval = entry.options.get(CONF_STATE_WRITE_INTERVAL, STATE_WRITE_INTERVAL)
+    entities = {}
+
+    @callback
+    def async_add_devices(devices):
+        new_entities = []
+        for device_info in devices:
+            if device_info["_id"] not in entities:
+                entity = GfCover(hass, device_info, client, entry.data, commands, write_interval)
+                entities[device_info["_id"]] = entity
+                new_entities.append(entity)
+        if new_entities:
+            async_add_entities(new_entities)
+
+    @callback
+    def async_handle_devices_changed(added, removed):
+        # onHomeInfo 增量比对后只增删有变化的设备对应的实体。
+        # 设备可能只是暂时离线而未出现在 onHomeInfo 中，因此只移除运行中的实体，
+        # 保留实体注册表中的记录（entity_id、区域、HomeKit 映射等），
+        # 设备重新出现时沿用原有设置；确需删除时由用户在界面中清理
+        async_add_devices(added)
+        for device_info in removed:
+            entity = entities.pop(device_info["_id"], None)
+            if entity is not None and entity.hass is not None and entity.entity_id is not None:
+                hass.async_create_task(entity.async_remove())
+
+    async_add_devices(client.devices_info)
+    entry.async_on_unload(client.add_devices_listener(async_handle_devices_changed))
 
 
-class GfCover(CoverEntity):
-    def __init__(self, hass, device_info, client, config_data):
+class GfCover(CoverEntity, RestoreEntity):
+    # 状态全部来自云端推送，不需要 HA 定时轮询
+    _attr_should_poll = False
+
+    def __init__(self, hass, device_info, client, config_data, commands=None, write_interval=STATE_WRITE_INTERVAL):
         self.hass = hass
         self._attr_unique_id = device_info["_id"]
-        self._attr_name = device_info["e_name"]
         self._device_info = device_info
         self._client = client
         self._config_data = config_data
+        self._commands = commands
+        # 状态写入合并：记录上次写入的状态和时间；运动中估算位置的刷新间隔不小于写入间隔
+        self._motion_interval = max(MOTION_UPDATE_INTERVAL, write_interval)
+        self._written_state = None
+        self._last_write = None
+        # 运动模型：按学习到的行程时间估算百分比位置，命令发出后立即乐观更新
+        self._motion = MotionModel()
+        self._motion.observe(device_info["position"], hass.loop.time())
+        self._motion_handle = None
+        self._timed_stop = None
         self._attr_supported_features = (
                 CoverEntityFeature.OPEN | CoverEntityFeature.CLOSE | CoverEntityFeature.STOP
+                | CoverEntityFeature.SET_POSITION
         )
-        # 监听自定义事件
-        self.hass.bus.async_listen("gf_device_status_update", self._handle_device_status_update)
+
+    @property
+    def name(self):
+        # 名称随 onHomeInfo 中的 e_name 原地更新
+        return self._device_info["e_name"]
+
+    async def async_added_to_hass(self):
+        # 只订阅本设备的状态，状态更新不再经由 HA 事件总线广播给所有实体
+        self.async_on_remove(
+            self._client.subscribe_device(self._device_info["_id"], self._handle_device_status_update)
+        )
+        self.async_on_remove(self._client.add_connection_listener(self._handle_connection_change))
+        self.async_on_remove(self._cancel_motion_updates)
+        self.async_on_remove(self._cancel_timed_stop)
+
+        # 恢复上次学习到的行程时间
+        last_state = await self.async_get_last_state()
+        if last_state is not None:
+            self._motion.open_time = last_state.attributes.get(ATTR_OPEN_TIME)
+            self._motion.close_time = last_state.attributes.get(ATTR_CLOSE_TIME)
+        self._schedule_motion_update()
+
+    @property
+    def available(self):
+        # 使用缓存建立的实体在后台登录完成前显示为不可用
+        return self._client.logged_in
+
+    @property
+    def extra_state_attributes(self):
+        motion = self._motion
+        return {
+            ATTR_OPEN_TIME: round(motion.open_time, 1) if motion.open_time else None,
+            ATTR_CLOSE_TIME: round(motion.close_time, 1) if motion.close_time else None,
+        }
 
     @property
     def is_stopped(self):
-        return self._device_info["position"] == '0'
+        return self._motion.direction is None
 
     @property
     def is_closed(self):
-        return self._device_info["position"] == '1'
+        return self.current_cover_position == POSITION_CLOSED
 
     @property
     def is_opened(self):
-        return self._device_info["position"] == "2"
+        return self.current_cover_position == POSITION_OPEN
 
     @property
     def is_closing(self):
-        return self._device_info["position"] == '3'
+        return self._motion.direction == DIRECTION_CLOSING
 
     @property
     def is_opening(self):
-        return self._device_info["position"] == '4'
+        return self._motion.direction == DIRECTION_OPENING
 
     @property
     def current_cover_position(self):
-        return self._device_info["position"]
+        position = self._motion.position(self.hass.loop.time())
+        return None if position is None else round(position)
 
     async def async_open_cover(self, **kwargs):
-        await self._client.remote_control(
-            self._config_data["mobile"],
-            self._config_data["password"],
-            self._config_data["clientid"],
-            self._device_info["_id"],
-            1
-        )
+        await self._move(DIRECTION_OPENING)
 
     async def async_close_cover(self, **kwargs):
-        await self._client.remote_control(
-            self._config_data["mobile"],
-            self._config_data["password"],
-            self._config_data["clientid"],
-            self._device_info["_id"],
-            2
-        )
+        await self._move(DIRECTION_CLOSING)
 
     async def async_stop_cover(self, **kwargs):
-        await self._client.remote_control(
+        await self._move(None)
+
+    async def async_set_cover_position(self, **kwargs):
+        # 设备只支持整程升降，中间位置通过先移动、按估算行程时间再发 stop 实现
+        target = kwargs[ATTR_POSITION]
+        if target in (POSITION_CLOSED, POSITION_OPEN):
+            await self._move(DIRECTION_OPENING if target == POSITION_OPEN else DIRECTION_CLOSING)
+            return
+        direction, duration = self._motion.time_to(target, self.hass.loop.time())
+        if direction is None:
+            return
+        if await self._move(direction):
+            self._timed_stop = self.hass.loop.call_later(duration, self._async_timed_stop)
+
+    async def _move(self, direction):
+        # 先乐观更新状态，命令失败时回退到发送前的位置
+        self._cancel_timed_stop()
+        loop = self.hass.loop
+        previous = self._motion.position(loop.time())
+        if direction is None:
+            self._motion.stop(loop.time())
+            operation_code = OPERATION_STOP
+        else:
+            self._motion.start(direction, loop.time())
+            operation_code = OPERATION_PUT_DOWN if direction == DIRECTION_OPENING else OPERATION_RAISE_UP
+        self._async_write_now()
+        self._schedule_motion_update()
+
+        if await self._send_command(operation_code):
+            return True
+        _LOGGER.error(f"设备 {self.name} 命令发送失败，恢复之前的状态")
+        self._motion.set_position(previous)
+        self._async_write_now()
+        return False
+
+    @callback
+    def _async_timed_stop(self):
+        self._timed_stop = None
+        self.hass.async_create_task(self._move(None))
+
+    @callback
+    def _cancel_timed_stop(self):
+        if self._timed_stop is not None:
+            self._timed_stop.cancel()
+            self._timed_stop = None
+
+    async def _send_command(self, operation_code):
+        # 经由命令合并器发送，短时间内的重复或被覆盖的命令不会各自请求云端
+        if self._commands is not None:
+            return await self._commands.submit(self._device_info["_id"], operation_code)
+        return await self._client.remote_control(
             self._config_data["mobile"],
             self._config_data["password"],
             self._config_data["clientid"],
             self._device_info["_id"],
-            3
+            operation_code
         )
 
-    async def async_update(self):
-        # 可添加更新设备状态的逻辑
-        pass
+    @callback
+    def _handle_connection_change(self, logged_in):
+        self._async_write_now()
 
     @callback
-    def _handle_device_status_update(self, event):
-        device_id = event.data.get("device_id")
-        position = event.data.get("position")
-        if device_id == self._device_info["_id"]:
-            self._device_info["position"] = position
-            self.schedule_update_ha_state()
+    def _handle_device_status_update(self, device):
+        self._motion.observe(device["position"], self.hass.loop.time())
+        # 状态迁移（如 opening -> opened）立即写入；运动中同一方向的连续推送不单独写入，
+        # 估算位置统一由运动定时器按写入间隔刷新，避免每条推送都产生一次 state_changed
+        if self._state_key() != self._written_state:
+            self._async_write_now()
+        self._schedule_motion_update()
+
+    def _state_key(self):
+        # 运动中状态只取决于方向（位置随时间变化，由定时器刷新）；静止时取位置
+        direction = self._motion.direction
+        return direction, self.current_cover_position if direction is None else None
 
+    @callback
+    def _async_write_now(self):
+        self._written_state = self._state_key()
+        self._last_write = self.hass.loop.time()
+        self.async_write_ha_state()
 
+    @callback
+    def _schedule_motion_update(self):
+        # 运动期间由这一个定时器刷新估算位置，直到设备报告到位或停止；
+        # 间隔内已有写入时顺延到该次写入的一个间隔之后
+        if self._motion.direction is None or self._motion_handle is not None:
+            return
+        delay = self._motion_interval
+        if self._last_write is not None:
+            delay = max(0, self._last_write + delay - self.hass.loop.time())
+        self._motion_handle = self.hass.loop.call_later(delay, self._async_motion_update)
+
+    @callback
+    def _async_motion_update(self):
+        self._motion_handle = None
+        if self._motion.direction is None:
+            return
+        if self._last_write is None or self.hass.loop.time() - self._last_write >= self._motion_interval:
+            self._async_write_now()
+        self._schedule_motion_update()
+
+    @callback
+    def _cancel_motion_updates(self):
+        if self._motion_handle is not None:
+            self._motion_handle.cancel()
+            self._motion_handle = None
@@ -0,0 +1,45 @@
+# 设备模型：从 onHomeInfo 提取精简的设备记录，并与当前设备索引做增量比对
+
+# 设备记录只保留集成实际使用的字段
+DEVICE_FIELDS = ('e_name', '_id', 'status', 'position')
+
+
+def extract_devices(home_info):
+    """遍历 homes -> layers -> homeGrids -> devices，返回 {_id: 精简设备记录}。"""
+    devices = {}
+    for home in home_info.get('homes', []):
+        for layer in home.get('layers', []):
+            for home_grid in layer.get('homeGrids', []):
+                for device in home_grid.get('devices', []):
+                    e_name = device.get('e_name')
+                    _id = device.get('_id')
+                    props = device.get('props') or {}
+                    status = props.get('status')
+                    position = props.get('position')
+                    if e_name and _id and status is not None and position is not None:
+                        devices[_id] = {
+                            'e_name': e_name,
+                            '_id': _id,
+                            'status': status,
+                            'position': position,
+                        }
+    return devices
+
+
+def reconcile(current, incoming):
+    """把 incoming 合并进 current（原地修改），返回 (新增记录, 移除记录, 变化记录)。
+
+    已存在的设备记录原地更新，持有该记录的实体无需重新获取。
+    """
+    added = []
+    changed = []
+    for _id, record in incoming.items():
+        existing = current.get(_id)
+        if existing is None:
+            current[_id] = record
+            added.append(record)
+        elif any(existing.get(field) != record[field] for field in DEVICE_FIELDS):
+            existing.update(record)
+            changed.append(existing)
+    removed = [current.pop(_id) for _id in [_id for _id in current if _id not in incoming]]
+    return added, removed, changed
@@ -0,0 +1,35 @@
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_CLIENTID, CONF_MOBILE, CONF_PASSWORD
+
+TO_REDACT = {CONF_MOBILE, CONF_PASSWORD, CONF_CLIENTID}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry):
+    client = hass.data[entry.entry_id]["client"]
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": async_redact_data(dict(entry.options), TO_REDACT),
+        },
+        "connection": {
+            "host": client.host,
+            "port": client.port,
+            "state": client.state,
+            "logged_in": client.logged_in,
+            "heartbeat_rtt": client.heartbeat_rtt,
+            "heartbeat_missed": client.heartbeat_missed,
+            "pending_requests": client.pending_requests,
+            "queued_commands": client.queued_commands,
+        },
+        "metrics": client.metrics.snapshot(),
+        "devices": client.devices_info,
+        "trace": {
+            "capacity": client.trace.capacity,
+            "sample_every": client.trace.sample_every,
+            "frames_seen": client.trace.seen,
+            "frames": client.trace.dump(),
+        },
+    }
@@ -1,118 +1,381 @@
 import asyncio
 import json
 import logging
-from homeassistant.core import Event
+import time
+from .backoff import Backoff
+from .const import OPERATION_STOP
+from .devices import extract_devices, reconcile
+from .metrics import ClientMetrics
+from .protocol import (
+    FLAG_PUSH,
+    FLAG_RESPONSE,
+    HANDSHAKE_ACK_FRAME,
+    HANDSHAKE_FRAME,
+    HEARTBEAT_FRAME,
+    MAX_BUFFER_SIZE,
+    MAX_FRAME_SIZE,
+    MAX_REQUEST_ID,
+    TYPE_DATA,
+    TYPE_HANDSHAKE_ACK,
+    TYPE_HEARTBEAT,
+    FrameDecoder,
+    encode_request,
+    loads,
+    read_varint,
+    response_code,
+    response_id,
+)
+from .send_queue import PRIORITY_COMMAND, PRIORITY_HIGH, PRIORITY_LOW, SEND_QUEUE_SIZE, SendQueue
+from .trace import DIRECTION_IN, DIRECTION_OUT, ProtocolTrace
 
 _LOGGER = logging.getLogger(__name__)
 
-SEQUENCE_NUMBER = 0
+# 单个请求等待响应的默认超时时间（秒）
+REQUEST_TIMEOUT = 30.0
+
+# 服务器握手未下发心跳间隔时使用的默认值（秒）
+HEARTBEAT_INTERVAL = 30.0
+# 单次心跳等待应答的超时时间（秒）
+HEARTBEAT_TIMEOUT = 10.0
+# 连续丢失多少次心跳应答后判定连接已失效
+HEARTBEAT_MAX_MISSED = 3
+
+# 断线重连的退避区间（秒）
+RECONNECT_INITIAL = 1.0
+RECONNECT_MAX = 300.0
+
+# 连接状态机：disconnected -> connecting -> handshaking -> logged_in
+STATE_DISCONNECTED = "disconnected"
+STATE_CONNECTING = "connecting"
+STATE_HANDSHAKING = "handshaking"
+STATE_LOGGED_IN = "logged_in"
+
+# events() 产出的事件类型
+EVENT_DEVICE_STATUS = "device_status"
+EVENT_DEVICES_CHANGED = "devices_changed"
+EVENT_CONNECTION = "connection"
+# events() 每个订阅者最多缓存的事件数，超出时丢弃最旧的事件
+EVENT_QUEUE_SIZE = 1024
 
 class GfClient:
-    def __init__(self, host, port, hass, max_retries=3):
-        self.hass = hass
+    def __init__(self, host, port, max_retries=3, heartbeat_interval=None,
+                 heartbeat_max_missed=HEARTBEAT_MAX_MISSED, trace_capacity=0, trace_sample_every=1,
+                 reconnect_initial=RECONNECT_INITIAL, reconnect_max=RECONNECT_MAX,
+                 send_queue_size=SEND_QUEUE_SIZE, max_frame_size=MAX_FRAME_SIZE, max_buffer_size=MAX_BUFFER_SIZE):
         self.host = host
         self.port = port
-        self.recv_buffer = b""
         self.login_event = asyncio.Event()
         self.login_error = None
-        self.last_sent_type = None
-        self.last_operation = None
+        # 最近一次登录是否被服务器拒绝（账号或密码错误），区别于连接失败
+        self.login_rejected = False
         self.receive_task = None
-        self.last_on_home_info = {}
-        self.devices_info = []
+        self.writer = None
+        # 每个连接一个写出任务，所有帧经优先级队列交给它写入套接字
+        self.send_queue_size = send_queue_size
+        # 接收侧分帧的单帧与缓冲区上限
+        self.max_frame_size = max_frame_size
+        self.max_buffer_size = max_buffer_size
+        self._send_queue = None
+        self._write_task = None
+        # 设备索引：_id -> 设备记录，以及按设备订阅的状态回调
+        self.devices = {}
+        self._device_listeners = {}
+        self._status_listeners = []
+        self._devices_listeners = []
+        # 登录状态及其监听者，实体据此切换可用状态
+        self.state = STATE_DISCONNECTED
+        self.logged_in = False
+        self._connection_listeners = []
+        self._login_rejected_listeners = []
+        self._session_ready = asyncio.Event()
+        # 连接监督任务：负责登录、断线检测以及按退避重连
+        self._supervisor_task = None
+        self._connection_lost_event = asyncio.Event()
+        # close() 之后客户端不再重新连接，之后的命令直接失败
+        self._closed = False
+        self._backoff = Backoff(reconnect_initial, reconnect_max)
         self.on_device_status_count = 0
         self.operation_success = False
         self.should_exit = False
+        # 命令因断线失败时，会话恢复后最多重发的次数
         self.max_retries = max_retries
-        self.is_connection_closed = False
+        self.is_connection_closed = True
         self.operation_ended_event = asyncio.Event()
         self._futures = {}
-
+        # 每个连接独立的请求序号计数器
+        self._sequence = 0
+        # 按请求序号登记的在途请求：序号 -> (future, operation)
+        self._pending = {}
+        # 心跳保活：未指定间隔时采用服务器握手下发的值
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_max_missed = heartbeat_max_missed
+        self.heartbeat_rtt = None
+        self.heartbeat_missed = 0
+        self._server_heartbeat = None
+        self._heartbeat_task = None
+        self._credentials = None
+        # 协议帧追踪，默认关闭
+        self.trace = ProtocolTrace(trace_capacity, trace_sample_every)
+        # 原始字节流抓包（ProtocolCapture），默认关闭
+        self.capture = None
+        self.metrics = ClientMetrics()
+        # 推送路由分发表：路由名（字节） -> 处理函数
+        self._push_handlers = {
+            b"onHomeInfo": self._process_on_home_info,
+            b"onLoginInfoEnd": self._process_on_login_info_end,
+            b"onDeviceStatusData": self._process_on_device_status,
+        }
 
     async def connect(self):
-        if self.receive_task and not self.receive_task.done():
+        if not self.is_connection_closed and self.receive_task and not self.receive_task.done():
             return True  # 已经连接，直接返回
-        retries = 0
-        while retries < self.max_retries:
-            try:
-                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
-                self._log_info(f"已连接到服务器 {self.host}:{self.port}")
-                self.receive_task = asyncio.create_task(self.receive_messages())
-                self.is_connection_closed = False  # 连接成功，将连接断开标志置为 False
-                return True
-            except ConnectionError as e:
-                self._log_error(f"连接服务器失败: {e}, 重试第 {retries + 1} 次")
-                retries += 1
-        self._log_error("达到最大重试次数，连接失败")
-        self._exit_program()
-        self.is_connection_closed = True  # 连接失败，将连接断开标志置为 True
-        return False
+        if self.receive_task or self._write_task or self.writer:
+            # 清理已判定失效但尚未关闭的旧连接
+            await self._teardown_connection()
+        # 只尝试一次，失败后的重试由连接监督任务按退避间隔安排
+        self._set_state(STATE_CONNECTING)
+        try:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        except OSError as e:
+            self._log_error(f"连接服务器失败: {e}")
+            self._set_state(STATE_DISCONNECTED)
+            return False
+        self._log_info(f"已连接到服务器 {self.host}:{self.port}")
+        self.metrics.connects += 1
+        self.is_connection_closed = False  # 连接成功，将连接断开标志置为 False
+        self._send_queue = SendQueue(self.send_queue_size)
+        self._write_task = asyncio.create_task(self._write_loop(self._send_queue, self.writer))
+        self.receive_task = asyncio.create_task(self.receive_messages())
+        return True
+
+    def start(self, mobile, password, clientid):
+        """启动连接监督任务，由它完成登录并在断线后自动重连。"""
+        if self._closed:
+            return
+        if self.login_rejected and self._credentials == (mobile, password, clientid):
+            # 账号或密码已被服务器拒绝，换了凭据才重新登录，避免反复尝试导致账号被锁
+            return
+        self._credentials = (mobile, password, clientid)
+        if self._supervisor_task and not self._supervisor_task.done():
+            return
+        self.should_exit = False
+        if not self.logged_in:
+            self._session_ready.clear()
+        self._supervisor_task = asyncio.create_task(self._supervise())
+
+    async def wait_for_session(self, timeout=None):
+        """等待会话就绪（已登录），超时或客户端关闭时返回 False。"""
+        if self.logged_in:
+            return True
+        if self._closed:
+            return False
+        try:
+            await asyncio.wait_for(self._session_ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return self.logged_in
+
+    async def _supervise(self):
+        resumed = False
+        while not self.should_exit:
+            self._connection_lost_event.clear()
+            if not self.logged_in:
+                if not await self.login(*self._credentials):
+                    await self._teardown_connection()
+                    if self.login_rejected:
+                        # 凭据错误重试也不会成功，停止重连并通知使用者重新验证
+                        self._log_error("账号或密码被服务器拒绝，停止重连")
+                        self._session_ready.set()
+                        for callback in tuple(self._login_rejected_listeners):
+                            callback()
+                        return
+                    delay = self._backoff.next()
+                    self._log_error(f"登录失败，{delay:.1f} 秒后第 {self._backoff.attempts} 次重连")
+                    await asyncio.sleep(delay)
+                    continue
+                if resumed:
+                    # 登录后服务器会重新推送 onHomeInfo，设备列表和位置随之刷新；
+                    # 断线期间在途的命令由各自的请求在会话恢复后重发
+                    self._log_info("会话已恢复")
+            self._backoff.reset()
+            await self._connection_lost_event.wait()
+            if self.should_exit:
+                break
+            await self._teardown_connection()
+            resumed = True
+            delay = self._backoff.next()
+            self._log_info(f"连接已断开，{delay:.1f} 秒后重连")
+            await asyncio.sleep(delay)
 
     async def close(self):
         try:
+            self._closed = True
             self.should_exit = True
-            self.is_connection_closed = True
-            
-            if not self.login_event.is_set():
-                self.login_error = "连接已关闭"
-                self.login_event.set()
-            
-            for future in self._futures.values():
-                if not future.done():
-                    future.set_exception(asyncio.CancelledError("连接关闭"))
-            self._futures.clear()
-            
-            # 取消接收任务
-            if self.receive_task and not self.receive_task.done():
-                self.receive_task.cancel()
+            task = self._supervisor_task
+            self._supervisor_task = None
+            if task and not task.done() and task is not asyncio.current_task():
+                task.cancel()
                 try:
-                    await asyncio.wait_for(self.receive_task, timeout=1.0)
+                    await asyncio.wait_for(task, timeout=1.0)
                 except (asyncio.CancelledError, asyncio.TimeoutError):
                     pass
-            
-            # 关闭写入器
-            if hasattr(self, 'writer') and self.writer:
-                try:
-                    self.writer.close()
-                    await asyncio.wait_for(self.writer.wait_closed(), timeout=2.0)
-                except (asyncio.TimeoutError, Exception) as e:
-                    self._log_error(f"关闭写入器时出错: {e}")
-            
+            await self._teardown_connection()
+            # 释放仍在等待会话的命令
+            self._session_ready.set()
             self._log_info("连接已关闭")
             self._exit_program()
             
         except Exception as e:
             self._log_error(f"关闭连接时出错: {e}")
 
-    async def send_message(self, hex_str, operation=None, retries=0):
-        if self.is_connection_closed:
-            if not await self.connect():
-                return
+    def _connection_lost(self, reason):
+        """连接失效时由接收、发送或心跳路径调用，唤醒监督任务重连。"""
+        if not self.is_connection_closed:
+            self._log_error(f"连接已断开: {reason}")
+        self._mark_disconnected(reason)
+        self._connection_lost_event.set()
+
+    def _mark_disconnected(self, reason):
+        self.is_connection_closed = True
+        self._set_state(STATE_DISCONNECTED)
+
+        if not self.login_event.is_set():
+            self.login_error = reason
+            self.login_event.set()
+
+        # 等待中的请求以 ConnectionError 结束，调用方据此在会话恢复后重发
+        error = ConnectionResetError(reason)
+        if self._send_queue is not None:
+            self._send_queue.close(error)
+        for future in self._futures.values():
+            if not future.done():
+                future.set_exception(error)
+        self._futures.clear()
+        for future, _ in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+
+    async def _teardown_connection(self):
+        self._mark_disconnected("连接已关闭")
+        self._stop_heartbeat()
+
+        # 取消接收任务
+        receive_task, self.receive_task = self.receive_task, None
+        if receive_task and not receive_task.done() and receive_task is not asyncio.current_task():
+            receive_task.cancel()
+            try:
+                await asyncio.wait_for(receive_task, timeout=1.0)
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                pass
+
+        # 取消写出任务
+        write_task, self._write_task = self._write_task, None
+        self._send_queue = None
+        if write_task and not write_task.done() and write_task is not asyncio.current_task():
+            write_task.cancel()
+            try:
+                await asyncio.wait_for(write_task, timeout=1.0)
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                pass
+
+        # 关闭写入器
+        writer, self.writer = self.writer, None
+        if writer:
+            try:
+                writer.close()
+                await asyncio.wait_for(writer.wait_closed(), timeout=2.0)
+            except (asyncio.TimeoutError, Exception) as e:
+                self._log_error(f"关闭写入器时出错: {e}")
+
+    async def send_message(self, frame, operation=None, request_id=None, timeout=REQUEST_TIMEOUT,
+                           priority=PRIORITY_COMMAND):
+        """把一帧交给写出任务并等待应答；超时返回 None，连接失效时抛出 ConnectionError。"""
+        queue = self._send_queue
+        if self.is_connection_closed or queue is None:
+            raise ConnectionResetError("连接未建立")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        frame_type = frame[0]
+        if request_id is not None:
+            # 数据帧按请求序号登记，响应帧会带回同一个序号
+            self._pending[request_id] = (future, operation)
+        else:
+            if frame_type == TYPE_HANDSHAKE_ACK:
+                # 服务器以心跳帧应答握手确认
+                frame_type = TYPE_HEARTBEAT
+            self._futures[frame_type] = future
+
+        try:
+            # 先登记再入队，避免写出后响应先到而丢失；队列满时在此等待
+            started = loop.time()
+            await queue.put(frame, priority, redact=operation == 'login')
+            result = await asyncio.wait_for(future, timeout)
+            if request_id is not None:
+                self.metrics.command_latency.add(loop.time() - started)
+            return result
+        except asyncio.TimeoutError:
+            self._log_error(f"等待响应超时: 类型 {frame_type:02x}, 序号 {request_id}, 操作 {operation}")
+        except ConnectionError as e:
+            self._connection_lost(f"发送消息时连接错误: {e}")
+            raise
+        finally:
+            if request_id is not None:
+                entry = self._pending.get(request_id)
+                if entry is not None and entry[0] is future:
+                    del self._pending[request_id]
+            elif self._futures.get(frame_type) is future:
+                del self._futures[frame_type]
+
+    async def _write_loop(self, queue, writer):
+        # 唯一写入套接字的任务：按优先级取帧，已就绪的帧合并后统一 drain
+        metrics = self.metrics
+        trace = self.trace
         try:
-            message_bytes = bytes.fromhex(hex_str)
-            self.writer.write(message_bytes)
-            await self.writer.drain()
-            self.last_sent_type = hex_str[:4]
-            self.last_operation = operation
-            future = asyncio.Future()
-            if self.last_sent_type == '0200':
-                self.last_sent_type = '0300'
-            self._futures[self.last_sent_type] = future
-            # self._log_info(f"发送: {hex_str}")
-            return await future
-        except ValueError as e:
-            self._log_error(f"无效的十六进制消息: {hex_str}")
+            while True:
+                frame, redact = await queue.get()
+                while True:
+                    if trace.enabled:
+                        trace.record(DIRECTION_OUT, frame, redact=redact)
+                    if self.capture is not None:
+                        self.capture.record(DIRECTION_OUT, frame, redact=redact)
+                    metrics.bytes_out += len(frame)
+                    writer.write(frame)
+                    if not len(queue):
+                        break
+                    frame, redact = queue.get_nowait()
+                await writer.drain()
         except ConnectionError as e:
-            if retries < self.max_retries:
-                self._log_error(f"发送消息时连接错误: {e}, 尝试重新连接并再次发送")
-                if await self.connect():
-                    await self.send_message(hex_str, operation, retries + 1)
-            else:
-                self._log_error("达到最大重试次数，发送消息失败")
-                self._exit_program()
+            self._connection_lost(f"发送消息时连接错误: {e}")
+        except asyncio.CancelledError:
+            pass
+
+    @property
+    def pending_requests(self):
+        return len(self._pending)
+
+    @property
+    def queued_commands(self):
+        """发送队列中尚未写出的命令数。"""
+        return self._send_queue.commands if self._send_queue is not None else 0
+
+    def cancel_pending(self, request_id=None):
+        """取消指定序号的在途请求；不指定序号时取消全部。"""
+        if request_id is None:
+            entries = list(self._pending.values())
+            self._pending.clear()
+        else:
+            entry = self._pending.pop(request_id, None)
+            entries = [entry] if entry is not None else []
+        for future, _ in entries:
+            if not future.done():
+                future.cancel()
 
     async def receive_messages(self):
-        incomplete_message = b""
+        decoder = FrameDecoder(max_frame_size=self.max_frame_size, max_buffer_size=self.max_buffer_size)
+        metrics = self.metrics
+        perf_counter = time.perf_counter
         while not self.should_exit:
             try:
                 if self.is_connection_closed:
@@ -120,138 +383,239 @@ class GfClient:
                 data = await self.reader.read(4096)
                 if not data:
                     self._log_info("服务器断开连接")
-                    self.is_connection_closed = True  # 服务器断开连接，将连接断开标志置为 True
+                    self._connection_lost("服务器断开连接")
                     break
-                incomplete_message += data
-                self._log_info(f"原始接收: {incomplete_message.hex()}")
-                while len(incomplete_message) > 0:
-                    data_type_hex = incomplete_message[:2].hex()
-                    if data_type_hex in ["0100", "0300", "0400"]:
-                        length_hex = incomplete_message[2:4].hex()
-                        data_length = int(length_hex, 16)
-                        total_length = 4 + data_length
-                        if len(incomplete_message) >= total_length:
-                            message = incomplete_message[:total_length]
-                            if not self.is_connection_closed:
-                                self.process_complete_message(message)
-                            # 移除已处理的完整消息
-                            incomplete_message = incomplete_message[total_length:]
-                            if data_type_hex in self._futures:
-                                future = self._futures.pop(data_type_hex)
-                                if not future.done():
-                                    future.set_result(message)
-                        else:
-                            self._log_info(f"数据不完整，当前数据: {incomplete_message}")
-                            break
+                if _LOGGER.isEnabledFor(logging.DEBUG):
+                    _LOGGER.debug("原始接收: %s", data.hex())
+                metrics.bytes_in += len(data)
+                if self.capture is not None:
+                    self.capture.record(DIRECTION_IN, data)
+                skipped = decoder.skipped_bytes
+                rejected = decoder.rejected_frames
+                rejected_data = decoder.rejected_data_frames
+                decoder.feed(data)
+                trace = self.trace
+                for message in decoder:
+                    if trace.enabled:
+                        trace.record(DIRECTION_IN, message)
+                    metrics.frame_received(message[0])
+                    if not self.is_connection_closed:
+                        started = perf_counter()
+                        self.process_complete_message(message)
+                        metrics.parse_time.add(perf_counter() - started)
+                    self._resolve_future(message)
+                metrics.skipped_bytes += decoder.skipped_bytes - skipped
+                if decoder.rejected_frames != rejected:
+                    metrics.rejected_frames += decoder.rejected_frames - rejected
+                    if decoder.rejected_data_frames != rejected_data:
+                        # 数据帧被丢弃意味着可能丢了应答或推送（如 onHomeInfo），需要让用户看到
+                        _LOGGER.warning(
+                            "丢弃 %s 个不可信的数据帧帧头，可能丢失了服务器消息",
+                            decoder.rejected_data_frames - rejected_data,
+                        )
                     else:
-                        # 跳过无效数据
-                        incomplete_message = incomplete_message[1:]
+                        _LOGGER.debug("丢弃 %s 个不可信的帧头", decoder.rejected_frames - rejected)
+                if len(decoder):
+                    _LOGGER.debug("数据不完整，当前缓冲长度: %s", len(decoder))
             except asyncio.CancelledError:
                 self._log_info("接收消息任务被取消")
                 break
+            except ConnectionError as e:
+                self._connection_lost(f"接收消息时连接错误: {e}")
+                break
             except Exception as e:
-                self._log_error(f"接收消息出错: {str(e)}，当前 incomplete_message: {incomplete_message}")
+                self._log_error(f"接收消息出错: {str(e)}，当前缓冲长度: {len(decoder)}")
                 # 发生异常时，等待一小段时间再继续，避免快速循环
                 await asyncio.sleep(0.1)
 
-        if incomplete_message and not self.is_connection_closed:
-            self.process_complete_message(incomplete_message)
+        # 连接结束时缓冲区中剩余的半帧直接丢弃，不再当作完整消息解析
+        if len(decoder):
+            _LOGGER.debug("丢弃未成帧的剩余数据 %s 字节", len(decoder))
+
+    def _resolve_future(self, message):
+        request_id = response_id(message)
+        if request_id is not None:
+            entry = self._pending.pop(request_id, None)
+            future = entry[0] if entry is not None else None
+        else:
+            future = self._futures.pop(message[0], None)
+        if future is not None and not future.done():
+            # 帧视图只在本轮迭代内有效，交给等待方前复制
+            future.set_result(bytes(message))
 
     def process_complete_message(self, message):
-        data_type = message[:2].hex()
-        if data_type == "0300":
-            self._log_info(f"收到心跳数据，原始数据: {message.hex()}")
+        # message 为 FrameDecoder 交出的 memoryview，不在此处复制整帧
+        frame_type = message[0]
+        if frame_type != TYPE_DATA:
+            # 心跳与握手应答不需要解析内容，由等待方自行处理
+            _LOGGER.debug("收到类型 %02x 的帧", frame_type)
             return
+        if len(message) < 6:
+            self._log_error("接收到的消息内容为空，无法解析")
+            return
+
+        data_length = 4 + int.from_bytes(message[2:4], "big")
+        flag = message[4]
+        try:
+            if flag == FLAG_RESPONSE:
+                # 响应帧：标志字节后是变长请求序号，随后直接是 JSON
+                request_id, body_offset = read_varint(message, 5)
+                entry = self._pending.get(request_id)
+                if entry is None:
+                    # 已超时或被取消的请求，无人关心其结果，不再解码
+                    _LOGGER.debug("收到无人等待的响应，序号 %s", request_id)
+                    return
+                parsed_content = loads(message[body_offset:data_length])
+                _LOGGER.debug("解析成功: 响应 %s - 内容: %s", request_id, parsed_content)
+                self._process_operation_feedback(parsed_content, entry[1])
+                return
 
-        length_hex = message[2:4].hex()
-        data_length = 4 + int(length_hex, 16)
-        content = message[4:data_length]
-        if data_type == "0400":
-            content = message[6:data_length]
+            if flag != FLAG_PUSH:
+                # 服务器不会发来请求帧，其他标志已在分帧时被拒绝
+                _LOGGER.debug("忽略标志为 %02x 的数据帧", flag)
+                return
 
+            # 推送帧：标志字节后是路由长度和路由名，直接在字节上查分发表
+            route_end = 6 + message[5]
+            route = bytes(message[6:route_end])
+            body_offset = route_end
+            handler = self._push_handlers.get(route)
+            if handler is None:
+                _LOGGER.debug("忽略未处理的推送: %s", route)
+                return
+            parsed_content = loads(message[body_offset:data_length])
+            _LOGGER.debug("解析成功: 推送 %s - 内容: %s", route, parsed_content)
+            handler(parsed_content)
+        except ValueError:
+            self._log_error(f"消息内容不是有效的 JSON 格式: {bytes(message[5:data_length])!r}")
+
+    def _process_on_device_status(self, parsed_content):
+        # 带 originUid 的是 App 主动查询的应答，只在位置变化时更新
+        if 'originUid' in parsed_content:
+            self._apply_status_reply(parsed_content)
+            return
+
+        for device in parsed_content.get('devices') or ():
+            _id = device.get('_id')
+            position = (device.get('props') or {}).get('position')
+            if _id and position is not None:
+                self._update_device_status(_id, position)
+                _LOGGER.debug("更新设备 %s 的位置为 %s", device.get('e_name'), position)
+
+    @property
+    def devices_info(self):
+        return list(self.devices.values())
+
+    def subscribe_device(self, device_id, callback):
+        """订阅单个设备的状态更新，返回取消订阅的函数。"""
+        listeners = self._device_listeners.setdefault(device_id, [])
+        listeners.append(callback)
+
+        def unsubscribe():
+            listeners.remove(callback)
+            if not listeners and self._device_listeners.get(device_id) is listeners:
+                del self._device_listeners[device_id]
+
+        return unsubscribe
+
+    def add_connection_listener(self, callback):
+        """监听登录状态变化，返回取消监听的函数。"""
+        self._connection_listeners.append(callback)
+        return lambda: self._connection_listeners.remove(callback)
+
+    def add_login_rejected_listener(self, callback):
+        """监听登录被拒绝（账号或密码错误）导致的停止重连，返回取消监听的函数。"""
+        self._login_rejected_listeners.append(callback)
+        return lambda: self._login_rejected_listeners.remove(callback)
+
+    def _set_state(self, state):
+        if self.state != state:
+            _LOGGER.debug("连接状态: %s -> %s", self.state, state)
+            self.state = state
+        self._set_logged_in(state == STATE_LOGGED_IN)
+
+    def _set_logged_in(self, logged_in):
+        if self.logged_in == logged_in:
+            return
+        self.logged_in = logged_in
+        if logged_in:
+            self._session_ready.set()
+        else:
+            self._session_ready.clear()
+        for callback in tuple(self._connection_listeners):
+            callback(logged_in)
+
+    def load_devices(self, devices):
+        """用缓存的设备记录预先填充设备索引。"""
+        for device in devices:
+            if device.get('_id'):
+                self.devices[device['_id']] = dict(device)
+
+    def _update_device_status(self, device_id, position):
+        # 按 _id 直接定位设备记录，只通知订阅了该设备的回调
+        device = self.devices.get(device_id)
+        if device is None:
+            return
+        device['position'] = position
+        self._notify_device(device)
+
+    def _notify_device(self, device):
+        for callback in tuple(self._device_listeners.get(device['_id'], ())):
+            callback(device)
+        for callback in tuple(self._status_listeners):
+            callback(device)
+
+    def add_status_listener(self, callback):
+        """监听所有设备的状态更新，返回取消监听的函数。"""
+        self._status_listeners.append(callback)
+        return lambda: self._status_listeners.remove(callback)
+
+    async def events(self, maxsize=EVENT_QUEUE_SIZE):
+        """以异步迭代器订阅客户端事件，产出 (事件类型, 数据)。
+
+        device_status 的数据为设备记录的副本，devices_changed 为
+        (新增记录列表, 移除记录列表)，connection 为是否已登录。
+        """
+        queue = asyncio.Queue(maxsize)
+
+        def put(event):
+            if queue.full():
+                # 消费者跟不上时丢弃最旧的事件，保留最新状态
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+        unsubscribes = [
+            self.add_status_listener(lambda device: put((EVENT_DEVICE_STATUS, dict(device)))),
+            self.add_devices_listener(lambda added, removed: put((EVENT_DEVICES_CHANGED, (added, removed)))),
+            self.add_connection_listener(lambda logged_in: put((EVENT_CONNECTION, logged_in))),
+        ]
         try:
-            content_str = content.decode('utf-8')
-            if content_str.strip():
-                index_dict = content_str.find('{')
-                index_list = content_str.find('[')
-
-                if index_dict != -1 or index_list != -1:
-                    if index_dict == -1:
-                        start_index = index_list
-                    elif index_list == -1:
-                        start_index = index_dict
-                    else:
-                        start_index = min(index_dict, index_list)
-
-                    method = content_str[:start_index]
-                    json_str = content_str[start_index:]
-                    try:
-                        parsed_content = json.loads(json_str)
-                        self._log_info(f"解析成功: {data_type} 消息解析结果 - 方法: {method}, 内容: {parsed_content}")
-
-                        if method == "onHomeInfo":
-                            self._process_on_home_info(parsed_content)
-                        elif method == "onLoginInfoEnd":
-                            self._process_on_login_info_end(parsed_content)
-                        elif method == "onDeviceStatusData":
-                            # 当字典中有originUid字段时，跳过不设置设备位置状态
-                            if 'originUid' in parsed_content:
-                                self._log_info(f"原始状态获取成功,直接返回")
-                                return
-
-                            device = parsed_content.get('devices', [])[0]
-                            if device:
-                                e_name = device.get('e_name')
-                                _id = device.get('_id')
-                                status = device.get('props', {}).get('status')
-                                position = device.get('props', {}).get('position')
-                                event = Event("gf_device_status_update", {"device_id": _id, "position": position})
-                                self.hass.bus.fire(event.event_type, event.data)
-
-                                # 根据 _id 更新 devices_info 中对应设备的 position 值
-                                for dev in self.devices_info:
-                                    if dev.get('_id') == _id:
-                                        dev['position'] = position
-                                        self._log_info(f"更新设备 {e_name} 的位置为 {position}")
-                                        break
-
-                        if data_type == "0400" and len(message) >= 5 and message[4] == 0x04:
-                            self._process_operation_feedback(parsed_content)
-
-                    except json.JSONDecodeError:
-                        self._log_error(f"消息内容不是有效的 JSON 格式: {json_str}")
-                else:
-                    self._log_error(f"未找到有效的 JSON 起始标识，内容为: {content_str}")
-            else:
-                self._log_error("接收到的消息内容为空，无法解析")
-        except UnicodeDecodeError:
-            self._log_error(f"消息解码错误: 原始数据: {content.hex()}")
+            while True:
+                yield await queue.get()
+        finally:
+            for unsubscribe in unsubscribes:
+                unsubscribe()
+
+    def add_devices_listener(self, callback):
+        """监听设备增删，回调参数为 (新增记录列表, 移除记录列表)，返回取消监听的函数。"""
+        self._devices_listeners.append(callback)
+        return lambda: self._devices_listeners.remove(callback)
 
     def _process_on_home_info(self, parsed_content):
-        self.last_on_home_info = parsed_content
-        self.devices_info = []
-        homes = parsed_content.get('homes', [])
-        for home in homes:
-            layers = home.get('layers', [])
-            for layer in layers:
-                home_grids = layer.get('homeGrids', [])
-                for home_grid in home_grids:
-                    devices = home_grid.get('devices', [])
-                    for device in devices:
-                        e_name = device.get('e_name')
-                        _id = device.get('_id')
-                        status = device.get('props', {}).get('status')
-                        position = device.get('props', {}).get('position')
-                        if e_name and _id and status is not None and position is not None:
-                            self.devices_info.append({
-                                'e_name': e_name,
-                                '_id': _id,
-                                'status': status,
-                                'position': position,
-                            })
-        if not self.devices_info:
-            self._log_error("未从 onHomeInfo 中获取到设备信息，关闭连接并退出程序")
-            self.close()
+        # 只保留精简设备记录，不再保存完整的 onHomeInfo 内容
+        incoming = extract_devices(parsed_content)
+        if not incoming:
+            self._log_error("未从 onHomeInfo 中获取到设备信息")
+            return
+
+        added, removed, changed = reconcile(self.devices, incoming)
+        if added or removed or changed:
+            self._log_info(f"设备列表更新: 新增 {len(added)} 台, 移除 {len(removed)} 台, 变化 {len(changed)} 台")
+        for device in changed:
+            self._notify_device(device)
+        if added or removed:
+            for callback in tuple(self._devices_listeners):
+                callback(added, removed)
 
     def _process_on_login_info_end(self, parsed_content):
         code = parsed_content.get('code')
@@ -260,51 +624,53 @@ class GfClient:
             self.login_event.set()
         else:
             self._log_error("登录失败")
-            self.close()
+            self.login_error = f"登录失败 (code: {code})"
+            self.login_rejected = True
+            self.login_event.set()
 
-    def _process_operation_feedback(self, parsed_content):
+    def _process_operation_feedback(self, parsed_content, operation):
         if self.is_connection_closed:
             return
         code = parsed_content.get('code')
         codetxt = parsed_content.get('codetxt')
-        self._log_info(f"操作反馈信息 - code: {code}, codetxt: {codetxt}")
+        _LOGGER.debug("操作反馈信息 - code: %s, codetxt: %s", code, codetxt)
         self.operation_success = code == 200
         if code != 200:
-            if self.last_operation == 'login':
+            if operation == 'login':
                 self.login_error = f"登录失败: {codetxt} (code: {code})"
+                self.login_rejected = True
                 self.login_event.set()
                 return
-            self._log_error("操作返回码非 200，关闭连接并退出程序")
-            self.close()
-        elif self.last_operation == 'remote_control' and not self.operation_success:
+            self._log_error(f"操作 {operation} 返回码非 200: {codetxt} (code: {code})")
+        elif operation == 'remote_control' and not self.operation_success:
             self._log_info("设备操作失败")
 
-    def generate_hex_message(self, method_name, data, is_operation_command=False):
-        global SEQUENCE_NUMBER
-        SEQUENCE_NUMBER += 1
-        sequence_hex = format(SEQUENCE_NUMBER, '04X')
-
-        method_hex = method_name.encode('utf-8').hex().upper()
-        json_hex = json.dumps(data, separators=(',', ':')).encode('utf-8').hex().upper()
+    def _next_request_id(self):
+        # 序号在 1 ~ MAX_REQUEST_ID 之间循环，并跳过仍在等待响应的序号
+        while True:
+            self._sequence = self._sequence % MAX_REQUEST_ID + 1
+            if self._sequence not in self._pending:
+                return self._sequence
 
-        middle_part = "20" if not is_operation_command else "1F"
-        full_content_hex = sequence_hex + middle_part + method_hex + json_hex
-        length_hex = format(len(full_content_hex) // 2, '04X')
-
-        return f"0400{length_hex}{full_content_hex}"
+    def generate_message(self, method_name, data):
+        request_id = self._next_request_id()
+        return request_id, encode_request(request_id, method_name, data)
 
     async def login(self, mobile, password, clientid):
+        """完成一次连接、握手和登录，失败时断开连接并返回 False。"""
         if not await self.connect():
             return False
         
         self.login_event.clear()
         self.login_error = None
+        self.login_rejected = False
+        self._set_state(STATE_HANDSHAKING)
         
         try:
-            await self.send_message(
-                "0100003B7B22737973223A7B2276657273696F6E223A22302E332E30222C2274797065223A22756E6974792D736F636B6574227D2C2275736572223A7B7D7D")
+            handshake = await self.send_message(HANDSHAKE_FRAME, priority=PRIORITY_HIGH)
+            self._server_heartbeat = self._parse_handshake_heartbeat(handshake)
 
-            await self.send_message("02000000")
+            await self.send_message(HANDSHAKE_ACK_FRAME, priority=PRIORITY_HIGH)
 
             method_name = "connector.userEntryHandler.login"
             login_data = {
@@ -314,26 +680,125 @@ class GfClient:
                 "clientid": clientid
             }
 
-            hex_message = self.generate_hex_message(method_name, login_data)
-            await self.send_message(hex_message, operation='login')
+            request_id, message = self.generate_message(method_name, login_data)
+            await self.send_message(message, operation='login', request_id=request_id, priority=PRIORITY_HIGH)
             
             try:
                 await asyncio.wait_for(self.login_event.wait(), timeout=30.0)
                 if self.login_error:
                     self._log_error(self.login_error)
                     return False
+                self._credentials = (mobile, password, clientid)
+                self._start_heartbeat()
+                self._set_state(STATE_LOGGED_IN)
                 return True
             except asyncio.TimeoutError:
                 self._log_error("登录超时，请检查网络或服务器状态。")
-                await self.close()
+                await self._teardown_connection()
                 return False
                 
         except Exception as e:
             self._log_error(f"登录过程中发生错误: {e}")
-            await self.close()
+            await self._teardown_connection()
             return False
 
+    def _parse_handshake_heartbeat(self, handshake):
+        # 握手应答形如 {"code":200,"sys":{"heartbeat":30}}
+        if not handshake:
+            return None
+        try:
+            sys_info = json.loads(handshake[4:]).get('sys') or {}
+            heartbeat = sys_info.get('heartbeat')
+        except (ValueError, AttributeError):
+            return None
+        return float(heartbeat) if heartbeat else None
+
+    def _start_heartbeat(self):
+        if self._heartbeat_task and not self._heartbeat_task.done():
+            return
+        self.heartbeat_missed = 0
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    def _stop_heartbeat(self):
+        task = self._heartbeat_task
+        self._heartbeat_task = None
+        if task and not task.done() and task is not asyncio.current_task():
+            task.cancel()
+
+    async def _heartbeat_loop(self):
+        loop = asyncio.get_running_loop()
+        while not self.should_exit and not self.is_connection_closed:
+            interval = self.heartbeat_interval or self._server_heartbeat or HEARTBEAT_INTERVAL
+            await asyncio.sleep(interval)
+            if self.should_exit or self.is_connection_closed:
+                break
+
+            started = loop.time()
+            try:
+                reply = await self.send_message(
+                    HEARTBEAT_FRAME, timeout=min(interval, HEARTBEAT_TIMEOUT), priority=PRIORITY_LOW
+                )
+            except ConnectionError:
+                break
+            if reply is not None:
+                self.heartbeat_rtt = loop.time() - started
+                self.metrics.heartbeat_rtt.add(self.heartbeat_rtt)
+                self.heartbeat_missed = 0
+                continue
+
+            self.heartbeat_missed += 1
+            self._log_error(f"心跳应答丢失 ({self.heartbeat_missed}/{self.heartbeat_max_missed})")
+            if self.heartbeat_missed >= self.heartbeat_max_missed:
+                self._log_error("连续多次未收到心跳应答，判定连接已失效，提前重连")
+                self.heartbeat_missed = 0
+                self._connection_lost("心跳超时")
+                break
+
     async def remote_control(self, mobile, password, clientid, deviceId, operation_code):
+        # 连接断开时不在命令路径上重新登录，而是等待监督任务恢复会话
+        self.start(mobile, password, clientid)
+
+        # 重置事件
+        self.on_device_status_count = 0
+        self.operation_success = False
+        self.operation_ended_event.clear()
+
+        # 与 control_many 一致，只有返回码为 200 才算成功，云端拒绝的命令由调用方回退状态
+        response = await self._send_remote_control(deviceId, operation_code)
+        return response is not None and response_code(response) == 200
+
+    async def control_many(self, mobile, password, clientid, commands):
+        """批量控制多台设备。
+
+        commands 为 (deviceId, operation_code) 列表，所有请求在同一连接上
+        连续写出后统一等待响应，返回 {deviceId: 是否成功}。
+        """
+        commands = list(commands)
+        self.start(mobile, password, clientid)
+
+        responses = await asyncio.gather(
+            *(self._send_remote_control(deviceId, operation_code) for deviceId, operation_code in commands),
+            return_exceptions=True,
+        )
+        results = {}
+        for (deviceId, _), response in zip(commands, responses):
+            success = isinstance(response, (bytes, bytearray)) and response_code(response) == 200
+            results[deviceId] = success
+            if not success:
+                self._log_error(f"批量控制设备 {deviceId} 失败: {response!r}")
+        return results
+
+    def _apply_status_reply(self, parsed_content):
+        for device in parsed_content.get('devices') or ():
+            _id = device.get('_id')
+            record = self.devices.get(_id)
+            position = (device.get('props') or {}).get('position')
+            # 查询应答重复携带未变化的状态，只在位置变化时通知，不反复唤醒实体
+            if record is not None and position is not None and record.get('position') != position:
+                self._update_device_status(_id, position)
+        _LOGGER.debug("设备状态查询应答: %s", parsed_content.get('originUid'))
+
+    async def _send_remote_control(self, deviceId, operation_code):
         operation_mapping = {
             1: "putDown",
             2: "raiseUp",
@@ -341,26 +806,38 @@ class GfClient:
         }
         name = operation_mapping.get(operation_code)
 
-        # 判断连接是否断开
-        if self.is_connection_closed:
-            self._log_info("连接已断开，尝试重新连接并登录...")
-            if not await self.login(mobile, password, clientid):
-                return False
-
-        # 重置事件
-        self.on_device_status_count = 0
-        self.operation_success = False
-        self.operation_ended_event.clear()
-
         method_name = "main.userHandler.remoteControll"
         control_data = {
             "deviceId": deviceId,
             "props": [{"name": name, "method": "set", "value": None}]
         }
-
-        hex_message = self.generate_hex_message(method_name, control_data, is_operation_command=True)
-        await self.send_message(hex_message, operation='remote_control')
-        return True
+        # stop 与安全相关，排在所有动作命令之前写出
+        priority = PRIORITY_HIGH if operation_code == OPERATION_STOP else PRIORITY_COMMAND
+        return await self.request(method_name, control_data, operation='remote_control', priority=priority)
+
+    async def request(self, method_name, data, operation=None, timeout=REQUEST_TIMEOUT, priority=PRIORITY_COMMAND):
+        """在当前会话上发送请求并返回响应帧，超时或无法恢复会话时返回 None。
+
+        断线期间发起的请求等待会话恢复；已写出但因断线未收到响应的请求
+        在新会话上以新的序号重发，最多重发 max_retries 次。
+        """
+        for attempt in range(self.max_retries + 1):
+            if self._closed:
+                self._log_error(f"客户端已关闭，放弃请求 {operation}")
+                return None
+            if not await self.wait_for_session(timeout):
+                self._log_error(f"等待会话恢复超时，放弃请求 {operation}")
+                return None
+            request_id, message = self.generate_message(method_name, data)
+            try:
+                return await self.send_message(
+                    message, operation=operation, request_id=request_id, timeout=timeout, priority=priority
+                )
+            except ConnectionError as e:
+                if attempt < self.max_retries:
+                    self._log_info(f"请求 {operation} 因连接中断未完成 ({e})，会话恢复后重发")
+        self._log_error(f"请求 {operation} 重发 {self.max_retries} 次后仍未完成")
+        return None
 
     def _log_info(self, message):
         _LOGGER.info(message)
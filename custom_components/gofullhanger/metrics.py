@@ -0,0 +1,75 @@
+from collections import deque
+
+# 每个直方图保留的最近样本数，分位数在读取快照时才排序计算
+HISTOGRAM_SAMPLES = 1024
+
+
+class Histogram:
+    """保留最近样本的轻量直方图，记录时只做追加和累加。"""
+
+    def __init__(self, samples=HISTOGRAM_SAMPLES):
+        self._samples = deque(maxlen=samples)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self._samples.append(value)
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def snapshot(self, scale=1.0):
+        if not self.count:
+            return {"count": 0}
+        ordered = sorted(self._samples)
+        last = len(ordered) - 1
+
+        def pick(fraction):
+            return round(ordered[min(last, int(fraction * len(ordered)))] * scale, 3)
+
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count * scale, 3),
+            "p50": pick(0.50),
+            "p95": pick(0.95),
+            "p99": pick(0.99),
+            "max": round(self.max * scale, 3),
+        }
+
+
+class ClientMetrics:
+    """GfClient 的计数器与直方图，时间单位均为秒。"""
+
+    def __init__(self):
+        self.frames_in = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.skipped_bytes = 0
+        self.rejected_frames = 0
+        self.connects = 0
+        self.parse_time = Histogram()
+        self.command_latency = Histogram()
+        self.heartbeat_rtt = Histogram()
+
+    @property
+    def reconnects(self):
+        return max(0, self.connects - 1)
+
+    def frame_received(self, frame_type):
+        self.frames_in[frame_type] = self.frames_in.get(frame_type, 0) + 1
+
+    def snapshot(self):
+        return {
+            "frames_in": {f"{frame_type:02x}": count for frame_type, count in sorted(self.frames_in.items())},
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "skipped_bytes": self.skipped_bytes,
+            "rejected_frames": self.rejected_frames,
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "parse_time_us": self.parse_time.snapshot(1e6),
+            "command_latency_ms": self.command_latency.snapshot(1e3),
+            "heartbeat_rtt_ms": self.heartbeat_rtt.snapshot(1e3),
+        }
@@ -0,0 +1,114 @@
+# 运动模型：根据行程时间估算晾衣架的百分比位置，并从观测到的状态码学习全程时间
+
+# 设备上报的状态码
+CODE_STOPPED = '0'
+CODE_CLOSED = '1'
+CODE_OPENED = '2'
+CODE_CLOSING = '3'
+CODE_OPENING = '4'
+
+POSITION_CLOSED = 0
+POSITION_OPEN = 100
+
+DIRECTION_OPENING = 1
+DIRECTION_CLOSING = -1
+
+# 尚未学习到行程时间时使用的默认全程时间（秒）
+DEFAULT_TRAVEL_TIME = 20.0
+MIN_TRAVEL_TIME = 2.0
+MAX_TRAVEL_TIME = 180.0
+# 新观测值在学习结果中的权重
+LEARN_RATE = 0.5
+# 行程不足全程的这一比例时不用于学习
+MIN_LEARN_DISTANCE = 0.5
+
+
+class MotionModel:
+    """单台设备的运动模型。
+
+    时间由调用方传入（事件循环时间），模型本身不持有定时器。
+    open_time / close_time 为学习到的从全关到全开、从全开到全关所需的秒数，
+    尚未学习到时为 None，估算时使用 DEFAULT_TRAVEL_TIME。
+    """
+
+    def __init__(self, open_time=None, close_time=None):
+        self.open_time = open_time
+        self.close_time = close_time
+        self.direction = None
+        self._position = None
+        self._start_position = None
+        self._started = None
+        # 起点位置是否可信；起点靠猜测时不用于学习行程时间
+        self._reliable = False
+
+    def travel_time(self, direction):
+        learned = self.open_time if direction == DIRECTION_OPENING else self.close_time
+        return learned or DEFAULT_TRAVEL_TIME
+
+    def position(self, now):
+        """估算的当前位置（0 全关 ~ 100 全开），未知时返回 None。"""
+        if self.direction is None:
+            return self._position
+        moved = (now - self._started) / self.travel_time(self.direction) * 100
+        position = self._start_position + self.direction * moved
+        return min(POSITION_OPEN, max(POSITION_CLOSED, position))
+
+    def set_position(self, position):
+        self.direction = None
+        self._position = position
+
+    def start(self, direction, now):
+        position = self.position(now)
+        self._reliable = position is not None
+        if position is None:
+            # 起点未知时假定从另一端出发
+            position = POSITION_CLOSED if direction == DIRECTION_OPENING else POSITION_OPEN
+        self.direction = direction
+        self._start_position = position
+        self._started = now
+
+    def stop(self, now):
+        self.set_position(self.position(now))
+
+    def time_to(self, target, now):
+        """返回到达 target 所需的 (方向, 秒数)，已在目标位置时方向为 None。"""
+        position = self.position(now)
+        if position is None:
+            position = POSITION_OPEN - target if target in (POSITION_CLOSED, POSITION_OPEN) else POSITION_OPEN
+        if round(position) == target:
+            return None, 0.0
+        direction = DIRECTION_OPENING if target > position else DIRECTION_CLOSING
+        return direction, abs(target - position) / 100 * self.travel_time(direction)
+
+    def observe(self, code, now):
+        """根据设备上报的状态码校正模型。"""
+        if code == CODE_CLOSED:
+            self._arrive(POSITION_CLOSED, now)
+        elif code == CODE_OPENED:
+            self._arrive(POSITION_OPEN, now)
+        elif code == CODE_CLOSING:
+            if self.direction != DIRECTION_CLOSING:
+                self.start(DIRECTION_CLOSING, now)
+        elif code == CODE_OPENING:
+            if self.direction != DIRECTION_OPENING:
+                self.start(DIRECTION_OPENING, now)
+        elif code == CODE_STOPPED:
+            if self.direction is not None:
+                self.stop(now)
+
+    def _arrive(self, position, now):
+        direction = self.direction
+        if direction is not None and self._reliable and (position - self._start_position) * direction > 0:
+            distance = abs(position - self._start_position) / 100
+            if distance >= MIN_LEARN_DISTANCE:
+                self._learn(direction, (now - self._started) / distance)
+        self.set_position(position)
+
+    def _learn(self, direction, travel_time):
+        travel_time = min(MAX_TRAVEL_TIME, max(MIN_TRAVEL_TIME, travel_time))
+        current = self.open_time if direction == DIRECTION_OPENING else self.close_time
+        learned = travel_time if current is None else current * (1 - LEARN_RATE) + travel_time * LEARN_RATE
+        if direction == DIRECTION_OPENING:
+            self.open_time = learned
+        else:
+            self.close_time = learned
@@ -0,0 +1,77 @@
+from .coalescer import CommandCoalescer
+from .const import DOMAIN
+from .gf_client import GfClient
+
+
+def get_pool(hass):
+    """取得保存在 hass.data 中的连接池，不存在时创建。"""
+    pool = hass.data.get(DOMAIN)
+    if pool is None:
+        pool = hass.data[DOMAIN] = ClientPool()
+    return pool
+
+
+class PoolLease:
+    """连接池中的一个共享会话：客户端、命令合并器和引用计数。"""
+
+    def __init__(self, key, client, commands):
+        self.key = key
+        self.client = client
+        self.commands = commands
+        self.refs = 0
+        # 配置流程留下、等待条目设置接管的引用的超时句柄
+        self.handoff = None
+
+
+class ClientPool:
+    """按 (host, port, 账号, 密码, clientid) 共享 GfClient 的引用计数连接池。
+
+    凭据相同的多个配置条目共用一条已登录的连接和一份状态推送，
+    最后一个使用者释放时才关闭连接。客户端选项以第一个创建者为准。
+    凭据也是键的一部分：客户端重连和命令合并器都使用创建时的凭据，
+    某个条目改了密码后重新加载会得到新的会话，不会沿用旧密码重连。
+    """
+
+    def __init__(self):
+        self._leases = {}
+
+    def __len__(self):
+        return len(self._leases)
+
+    def acquire(self, host, port, mobile, password, clientid, adopt=False, **options):
+        """取得一次引用；adopt 为 True 时优先接管配置流程留下的引用而不新增。"""
+        key = (host, port, mobile, password, clientid)
+        lease = self._leases.get(key)
+        if adopt and lease is not None and lease.handoff is not None:
+            lease.handoff.cancel()
+            lease.handoff = None
+            return lease
+        if lease is None:
+            client = GfClient(host, port, **options)
+            commands = CommandCoalescer(
+                lambda device_id, operation_code: client.remote_control(
+                    mobile, password, clientid, device_id, operation_code
+                )
+            )
+            lease = self._leases[key] = PoolLease(key, client, commands)
+        lease.refs += 1
+        return lease
+
+    def hand_off(self, hass, lease, delay):
+        """把配置流程持有的引用留给随后的条目设置接管，delay 秒内无人接管时释放。"""
+        lease.handoff = hass.loop.call_later(delay, self._expire_handoff, hass, lease)
+
+    def _expire_handoff(self, hass, lease):
+        lease.handoff = None
+        hass.async_create_task(self.release(lease))
+
+    async def release(self, lease):
+        """释放一次引用；引用归零时关闭连接并返回 True。"""
+        lease.refs -= 1
+        if lease.refs > 0:
+            return False
+        if self._leases.get(lease.key) is lease:
+            del self._leases[lease.key]
+        lease.commands.cancel()
+        await lease.client.close()
+        return True
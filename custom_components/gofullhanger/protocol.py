@@ -0,0 +1,287 @@
+import json
+import re
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 随 Home Assistant 一起安装
+    orjson = None
+
+# 帧头：1 字节类型 + 1 字节 0x00 + 2 字节大端长度
+HEADER_SIZE = 4
+
+TYPE_HANDSHAKE = 0x01
+TYPE_HANDSHAKE_ACK = 0x02
+TYPE_HEARTBEAT = 0x03
+TYPE_DATA = 0x04
+
+# 数据帧第 5 个字节为消息标志：请求 / 响应 / 服务器推送
+FLAG_REQUEST = 0x00
+FLAG_RESPONSE = 0x04
+FLAG_PUSH = 0x06
+
+# 请求序号在 1 ~ 0xFFFF 之间循环
+MAX_REQUEST_ID = 0xFFFF
+
+# 客户端需要处理的帧类型：0100 / 0300 / 0400
+FRAME_TYPES = frozenset((TYPE_HANDSHAKE, TYPE_HEARTBEAT, TYPE_DATA))
+
+# 数据帧第一个字节允许的消息标志
+DATA_FLAGS = frozenset((FLAG_REQUEST, FLAG_RESPONSE, FLAG_PUSH))
+# 服务器发给客户端的数据帧只有响应和推送
+SERVER_DATA_FLAGS = frozenset((FLAG_RESPONSE, FLAG_PUSH))
+
+# 带 JSON 内容的帧，JSON 必须以 { 或 [ 开始、以 } 或 ] 结束
+JSON_FRAME_TYPES = frozenset((TYPE_HANDSHAKE, TYPE_DATA))
+JSON_START_BYTES = frozenset(b"{[")
+JSON_END_BYTES = frozenset(b"}]")
+
+# 单帧最大长度（含帧头），帧头声明的长度超过它时视为损坏的帧头并重新同步。
+# 长度字段只有 16 位，默认取协议允许的最大值，不拒绝任何合法帧；
+# 调小它不会节省内存，只会丢弃大家庭的 onHomeInfo 之类的真实数据
+MAX_FRAME_SIZE = HEADER_SIZE + 0xFFFF
+# 解码缓冲区上限，超出时丢弃最旧的数据
+MAX_BUFFER_SIZE = 256 * 1024
+
+
+if orjson is not None:
+    def loads(data):
+        """直接从字节切片解码 JSON，解析失败时抛出 ValueError。"""
+        return orjson.loads(data)
+else:
+    def loads(data):
+        """直接从字节切片解码 JSON，解析失败时抛出 ValueError。"""
+        return json.loads(bytes(data))
+
+
+def encode_varint(value):
+    """编码 7 位变长整数（低位在前）。"""
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def encode_frame(frame_type, body=b""):
+    return bytes((frame_type, 0)) + len(body).to_bytes(2, "big") + body
+
+
+def encode_request(request_id, route, data):
+    """直接编码请求数据帧：帧头、标志、请求序号、路由长度、路由、JSON。"""
+    route_bytes = route.encode("utf-8")
+    body = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    message_id = encode_varint(request_id)
+    length = 2 + len(message_id) + len(route_bytes) + len(body)
+    frame = bytearray((TYPE_DATA, 0))
+    frame += length.to_bytes(2, "big")
+    frame.append(FLAG_REQUEST)
+    frame += message_id
+    frame.append(len(route_bytes))
+    frame += route_bytes
+    frame += body
+    return frame
+
+
+# 握手与握手确认帧在模块加载时预先生成
+HANDSHAKE_FRAME = encode_frame(
+    TYPE_HANDSHAKE,
+    json.dumps(
+        {"sys": {"version": "0.3.0", "type": "unity-socket"}, "user": {}},
+        separators=(",", ":"),
+    ).encode("utf-8"),
+)
+HANDSHAKE_ACK_FRAME = encode_frame(TYPE_HANDSHAKE_ACK)
+HEARTBEAT_FRAME = encode_frame(TYPE_HEARTBEAT)
+
+
+def read_varint(buffer, offset):
+    """从 offset 处读取 7 位变长整数，返回 (值, 下一个偏移)。"""
+    value = 0
+    shift = 0
+    while True:
+        byte = buffer[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def _body_start(buffer, offset, end):
+    # buffer[offset:end] 为一整帧，返回其中 JSON 内容的起始位置，无法确定时返回 None
+    start = offset + HEADER_SIZE
+    if buffer[offset] != TYPE_DATA:
+        return start
+    try:
+        flag = buffer[start]
+        if flag == FLAG_PUSH:
+            return start + 2 + buffer[start + 1]
+        if flag in (FLAG_REQUEST, FLAG_RESPONSE):
+            start = read_varint(buffer, start + 1)[1]
+            if flag == FLAG_REQUEST:
+                start += 1 + buffer[start]
+            return start
+    except IndexError:
+        pass
+    return None
+
+
+def body_offset(frame):
+    """返回数据帧中 JSON 内容的起始位置（标志、序号和路由之后）。"""
+    if len(frame) <= HEADER_SIZE:
+        return len(frame)
+    start = _body_start(frame, 0, len(frame))
+    return HEADER_SIZE + 1 if start is None else min(len(frame), start)
+
+
+def response_id(message):
+    """返回响应帧携带的请求序号，非响应帧返回 None。"""
+    if len(message) > 5 and message[0] == TYPE_DATA and message[4] == FLAG_RESPONSE:
+        return read_varint(message, 5)[0]
+    return None
+
+
+def response_body(message):
+    """解析响应帧的 JSON 内容，无法解析或不是对象时返回 None。"""
+    if response_id(message) is None:
+        return None
+    _, offset = read_varint(message, 5)
+    try:
+        body = loads(message[offset:])
+    except ValueError:
+        return None
+    return body if isinstance(body, dict) else None
+
+
+def response_code(message):
+    """解析响应帧 JSON 中的 code 字段，无法解析时返回 None。"""
+    body = response_body(message)
+    return body.get("code") if body is not None else None
+
+
+class FrameDecoder:
+    """增量帧解码器。
+
+    接收到的数据追加到 bytearray 中，通过读偏移逐帧切出 memoryview，
+    遇到无效数据时直接跳到下一个合法的帧起始标记。帧头不可信（长度超过
+    max_frame_size、心跳帧带内容、数据帧标志不在 data_flags 中）时同样跳过
+    并重新同步，不会为一个损坏的长度字段一直等待；整帧到齐后若 JSON 内容的
+    开头或结尾对不上也视为伪帧头。默认按客户端接收服务器数据配置。交出的
+    帧视图只在迭代的当前轮次内有效，需要保留时请自行 bytes() 复制。
+    """
+
+    def __init__(self, frame_types=FRAME_TYPES, max_frame_size=MAX_FRAME_SIZE, max_buffer_size=MAX_BUFFER_SIZE,
+                 data_flags=SERVER_DATA_FLAGS):
+        self._buffer = bytearray()
+        self._offset = 0
+        self.max_frame_size = max_frame_size
+        self.max_buffer_size = max(max_buffer_size, max_frame_size)
+        self.skipped_bytes = 0
+        # 因帧头不可信而被拒绝的帧头数，以及其中的数据帧帧头数
+        self.rejected_frames = 0
+        self.rejected_data_frames = 0
+        self._frame_types = frozenset(frame_types)
+        self._data_flags = frozenset(data_flags)
+        # 合法帧起始标记：类型字节后跟 0x00
+        self._marker = re.compile(
+            b"[" + b"".join(re.escape(bytes((t,))) for t in sorted(self._frame_types)) + b"]\x00"
+        )
+
+    def __len__(self):
+        return len(self._buffer) - self._offset
+
+    def feed(self, data):
+        self._compact()
+        self._buffer += data
+        overflow = len(self._buffer) - self.max_buffer_size
+        if overflow > 0:
+            # 缓冲区超限时丢弃最旧的数据，下次迭代从剩余数据中重新同步
+            self._skip_to(overflow)
+            self._compact()
+
+    def __iter__(self):
+        buffer = self._buffer
+        frame_types = self._frame_types
+        data_flags = self._data_flags
+        max_frame_size = self.max_frame_size
+        end = len(buffer)
+        view = memoryview(buffer)
+        try:
+            while True:
+                offset = self._offset
+                if end - offset < 2:
+                    if offset < end and buffer[offset] not in frame_types:
+                        self._skip_to(end)
+                    return
+                frame_type = buffer[offset]
+                if frame_type not in frame_types or buffer[offset + 1] != 0:
+                    self._resync(offset + 1, end)
+                    continue
+                if end - offset < HEADER_SIZE:
+                    return
+                body_length = int.from_bytes(buffer[offset + 2:offset + 4], "big")
+                if (HEADER_SIZE + body_length > max_frame_size
+                        or (frame_type == TYPE_HEARTBEAT and body_length)
+                        or (frame_type == TYPE_DATA and (
+                            not body_length or (end - offset > HEADER_SIZE and buffer[offset + 4] not in data_flags)))):
+                    self._reject(frame_type)
+                    self._resync(offset + 1, end)
+                    continue
+                total_length = HEADER_SIZE + body_length
+                if end - offset < total_length:
+                    return
+                if (body_length and frame_type in JSON_FRAME_TYPES
+                        and not self._json_framed(buffer, offset, offset + total_length)):
+                    # 声明的长度与内容对不上（多为截断帧或伪帧头），丢弃帧头重新同步
+                    self._reject(frame_type)
+                    self._resync(offset + 1, end)
+                    continue
+                frame = view[offset:offset + total_length]
+                self._offset = offset + total_length
+                try:
+                    yield frame
+                finally:
+                    frame.release()
+        finally:
+            view.release()
+
+    @staticmethod
+    def _json_framed(buffer, offset, end):
+        # 声明的长度与内容要对得上：JSON 以 { 或 [ 开始、以 } 或 ] 结束
+        if buffer[end - 1] not in JSON_END_BYTES:
+            return False
+        start = _body_start(buffer, offset, end)
+        return start is not None and start < end and buffer[start] in JSON_START_BYTES
+
+    def _reject(self, frame_type):
+        self.rejected_frames += 1
+        if frame_type == TYPE_DATA:
+            self.rejected_data_frames += 1
+
+    def _resync(self, start, end):
+        match = self._marker.search(self._buffer, start)
+        if match is not None:
+            self._skip_to(match.start())
+        elif self._buffer[end - 1] in self._frame_types:
+            # 最后一个字节可能是下一帧的类型字节，保留等待后续数据
+            self._skip_to(max(start, end - 1))
+        else:
+            self._skip_to(end)
+
+    def _skip_to(self, position):
+        self.skipped_bytes += position - self._offset
+        self._offset = position
+
+    def _compact(self):
+        if not self._offset:
+            return
+        try:
+            del self._buffer[:self._offset]
+        except BufferError:
+            # 仍有帧视图未释放时无法原地收缩，改为复制剩余数据
+            self._buffer = bytearray(self._buffer[self._offset:])
+        self._offset = 0
@@ -0,0 +1,102 @@
+import asyncio
+import heapq
+import itertools
+from collections import deque
+
+# 发送优先级，数值越小越先写出：
+# 握手、登录和 stop 最先，其次是动作命令，最后是心跳和状态查询
+PRIORITY_HIGH = 0
+PRIORITY_COMMAND = 1
+PRIORITY_LOW = 2
+
+# 发送队列容量，队列满时普通帧的发送方等待写出任务腾出位置
+SEND_QUEUE_SIZE = 64
+
+
+class SendQueue:
+    """连接唯一写出任务前的有界优先级队列。
+
+    同一优先级内保持先进先出。队列满时 put() 阻塞调用方形成背压，
+    PRIORITY_HIGH 的帧不受容量限制，保证 stop 不会排在背压之后。
+    """
+
+    def __init__(self, maxsize=SEND_QUEUE_SIZE):
+        self.maxsize = maxsize
+        # 队列中尚未写出的命令帧数（PRIORITY_COMMAND 及以上）
+        self.commands = 0
+        self._heap = []
+        self._counter = itertools.count()
+        self._getter = None
+        self._putters = deque()
+        self._error = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def full(self):
+        return len(self._heap) >= self.maxsize
+
+    async def put(self, frame, priority=PRIORITY_COMMAND, redact=False):
+        loop = asyncio.get_running_loop()
+        while True:
+            if self._error is not None:
+                raise self._error
+            if priority == PRIORITY_HIGH or not self.full():
+                break
+            waiter = loop.create_future()
+            self._putters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # 已被唤醒却放弃入队，把位置让给下一个等待者
+                    self._wake_putter()
+                raise
+            finally:
+                if waiter in self._putters:
+                    self._putters.remove(waiter)
+
+        heapq.heappush(self._heap, (priority, next(self._counter), frame, redact))
+        if priority <= PRIORITY_COMMAND:
+            self.commands += 1
+        getter = self._getter
+        if getter is not None and not getter.done():
+            getter.set_result(None)
+
+    async def get(self):
+        """取出优先级最高的帧，返回 (frame, redact)；只允许一个消费者。"""
+        while not self._heap:
+            if self._error is not None:
+                raise self._error
+            self._getter = asyncio.get_running_loop().create_future()
+            try:
+                await self._getter
+            finally:
+                self._getter = None
+        return self.get_nowait()
+
+    def get_nowait(self):
+        priority, _, frame, redact = heapq.heappop(self._heap)
+        if priority <= PRIORITY_COMMAND:
+            self.commands -= 1
+        self._wake_putter()
+        return frame, redact
+
+    def close(self, error):
+        """丢弃队列中的帧，并以 error 唤醒所有等待者。"""
+        self._error = error
+        self._heap.clear()
+        self.commands = 0
+        for waiter in self._putters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._putters.clear()
+        if self._getter is not None and not self._getter.done():
+            self._getter.set_result(None)
+
+    def _wake_putter(self):
+        while self._putters:
+            waiter = self._putters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
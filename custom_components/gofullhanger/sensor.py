@@ -0,0 +1,51 @@
+# sensor.py
+from datetime import timedelta
+from homeassistant.components.sensor import SensorEntity, SensorStateClass
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import HomeAssistant
+
+# 诊断传感器只读取内存中的计数器，低频轮询即可
+SCAN_INTERVAL = timedelta(seconds=60)
+
+
+# (key, 名称, 单位, 状态类别, 取值函数)
+DIAGNOSTIC_SENSORS = (
+    ("command_latency_p95", "命令延迟 P95", UnitOfTime.MILLISECONDS, SensorStateClass.MEASUREMENT,
+     lambda metrics: metrics.command_latency.snapshot(1e3).get("p95")),
+    ("heartbeat_rtt", "心跳往返时间", UnitOfTime.MILLISECONDS, SensorStateClass.MEASUREMENT,
+     lambda metrics: metrics.heartbeat_rtt.snapshot(1e3).get("p50")),
+    ("frames_received", "接收帧数", None, SensorStateClass.TOTAL_INCREASING,
+     lambda metrics: sum(metrics.frames_in.values())),
+    ("reconnects", "重连次数", None, SensorStateClass.TOTAL_INCREASING,
+     lambda metrics: metrics.reconnects),
+    ("skipped_bytes", "丢弃字节数", None, SensorStateClass.TOTAL_INCREASING,
+     lambda metrics: metrics.skipped_bytes),
+)
+
+
+async def async_setup_entry(
+        hass: HomeAssistant, entry: ConfigEntry, async_add_entities
+):
+    client = hass.data[entry.entry_id]["client"]
+    async_add_entities(
+        GfDiagnosticSensor(entry, client, *description) for description in DIAGNOSTIC_SENSORS
+    )
+
+
+class GfDiagnosticSensor(SensorEntity):
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    # 默认禁用，需要排查性能问题时再在界面中启用
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(self, entry, client, key, name, unit, state_class, value_fn):
+        self._client = client
+        self._value_fn = value_fn
+        self._attr_unique_id = f"{entry.entry_id}_{key}"
+        self._attr_name = f"{entry.title} {name}"
+        self._attr_native_unit_of_measurement = unit
+        self._attr_state_class = state_class
+
+    @property
+    def native_value(self):
+        return self._value_fn(self._client.metrics)
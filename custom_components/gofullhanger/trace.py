@@ -0,0 +1,52 @@
+import time
+from collections import deque
+
+from .protocol import TYPE_DATA, body_offset
+
+DIRECTION_IN = "in"
+DIRECTION_OUT = "out"
+
+
+class ProtocolTrace:
+    """协议帧追踪：按采样间隔把原始帧复制进固定容量的环形缓冲区。
+
+    capacity 为 0 时关闭追踪，调用方应先判断 enabled 再调用 record，
+    关闭时热路径上不产生任何复制或字符串处理。
+    """
+
+    def __init__(self, capacity=0, sample_every=1):
+        self.capacity = capacity
+        self.sample_every = max(1, sample_every)
+        self.enabled = capacity > 0
+        self.seen = 0
+        self._frames = deque(maxlen=capacity or None)
+
+    def record(self, direction, frame, redact=False):
+        self.seen += 1
+        if self.sample_every > 1 and self.seen % self.sample_every:
+            return
+        if redact:
+            # 含敏感信息的帧（如登录请求）只保留帧头
+            data = bytes(frame[:4])
+        elif direction == DIRECTION_IN and frame[0] == TYPE_DATA:
+            # 入站数据帧的 JSON 含家庭、设备名称等账号信息，只保留帧头、序号和路由
+            data = bytes(frame[:body_offset(frame)])
+        else:
+            data = bytes(frame)
+        self._frames.append((time.time(), direction, len(frame), data))
+
+    def clear(self):
+        self._frames.clear()
+        self.seen = 0
+
+    def dump(self):
+        return [
+            {
+                "time": timestamp,
+                "direction": direction,
+                "length": length,
+                "hex": data.hex(),
+                "redacted": length != len(data),
+            }
+            for timestamp, direction, length, data in self._frames
+        ]
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 让测试无需安装即可导入 custom_components 包
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,32 @@
+from custom_components.gofullhanger.gf_client import GfClient
+
+
+def _client():
+    client = GfClient("127.0.0.1", 0)
+    client.load_devices([{"_id": "a", "e_name": "晾衣架1", "status": "1", "position": "1"}])
+    return client
+
+
+def _status(position, **extra):
+    return {"devices": [{"_id": "a", "e_name": "晾衣架1", "props": {"status": "1", "position": position}}], **extra}
+
+
+def test_status_push_updates_position():
+    client = _client()
+    seen = []
+    client.add_status_listener(lambda device: seen.append(device["position"]))
+    client._process_on_device_status(_status("4"))
+    client._process_on_device_status(_status("4"))
+    assert client.devices["a"]["position"] == "4"
+    assert seen == ["4", "4"]
+
+
+def test_origin_uid_reply_notifies_only_on_change():
+    client = _client()
+    seen = []
+    client.add_status_listener(lambda device: seen.append(device["position"]))
+    client._process_on_device_status(_status("1", originUid="uid"))
+    client._process_on_device_status(_status("2", originUid="uid"))
+    client._process_on_device_status(_status("2", originUid="uid"))
+    assert client.devices["a"]["position"] == "2"
+    assert seen == ["2"]
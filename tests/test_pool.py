@@ -0,0 +1,22 @@
+import asyncio
+
+from custom_components.gofullhanger.pool import ClientPool
+
+
+async def _leases():
+    pool = ClientPool()
+    first = pool.acquire("127.0.0.1", 1, "m", "p", "c")
+    shared = pool.acquire("127.0.0.1", 1, "m", "p", "c")
+    # 改了密码的条目得到新的会话，不会沿用旧凭据
+    changed = pool.acquire("127.0.0.1", 1, "m", "p2", "c")
+    result = (shared is first, changed is first, first.refs, len(pool))
+    closed = [await pool.release(first), await pool.release(shared), await pool.release(changed)]
+    return result, closed, len(pool)
+
+
+def test_leases_keyed_by_credentials():
+    (shared, changed, refs, size), closed, remaining = asyncio.run(_leases())
+    assert shared and not changed
+    assert refs == 2 and size == 2
+    assert closed == [False, True, True]
+    assert remaining == 0
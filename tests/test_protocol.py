@@ -0,0 +1,174 @@
+import json
+
+from custom_components.gofullhanger.protocol import (
+    FLAG_PUSH,
+    FLAG_REQUEST,
+    FLAG_RESPONSE,
+    HANDSHAKE_FRAME,
+    HEADER_SIZE,
+    HEARTBEAT_FRAME,
+    TYPE_DATA,
+    TYPE_HEARTBEAT,
+    FrameDecoder,
+    body_offset,
+    encode_frame,
+    encode_request,
+    encode_varint,
+    response_code,
+)
+
+
+def response_frame(request_id, data):
+    body = bytes((FLAG_RESPONSE,)) + encode_varint(request_id) + json.dumps(data).encode()
+    return encode_frame(TYPE_DATA, body)
+
+
+def push_frame(route, data):
+    route_bytes = route.encode()
+    body = bytes((FLAG_PUSH, len(route_bytes))) + route_bytes + json.dumps(data).encode()
+    return encode_frame(TYPE_DATA, body)
+
+
+def decode(decoder, *chunks):
+    frames = []
+    for chunk in chunks:
+        decoder.feed(chunk)
+        frames.extend(bytes(frame) for frame in decoder)
+    return frames
+
+
+FRAMES = [
+    HANDSHAKE_FRAME,
+    HEARTBEAT_FRAME,
+    response_frame(1, {"code": 200}),
+    push_frame("onHomeInfo", [{"deviceId": "a"}]),
+    response_frame(300, {"code": 500, "msg": "失败"}),
+]
+STREAM = b"".join(FRAMES)
+
+
+def test_whole_stream():
+    assert decode(FrameDecoder(), STREAM) == FRAMES
+
+
+def test_byte_by_byte():
+    decoder = FrameDecoder()
+    assert decode(decoder, *(STREAM[i:i + 1] for i in range(len(STREAM)))) == FRAMES
+    assert decoder.skipped_bytes == 0
+    assert len(decoder) == 0
+
+
+def test_partial_frame_waits():
+    decoder = FrameDecoder()
+    frame = response_frame(7, {"code": 200})
+    assert decode(decoder, frame[:HEADER_SIZE + 2]) == []
+    assert len(decoder) == HEADER_SIZE + 2
+    assert decode(decoder, frame[HEADER_SIZE + 2:]) == [frame]
+
+
+def test_garbage_between_frames():
+    decoder = FrameDecoder()
+    frames = decode(decoder, b"\xff\x00garbage" + FRAMES[2] + b"\x04\x07\x99" + FRAMES[3])
+    assert frames == [FRAMES[2], FRAMES[3]]
+    assert decoder.skipped_bytes > 0
+
+
+def test_oversize_length_resyncs():
+    decoder = FrameDecoder(max_frame_size=1024)
+    bogus = bytes((TYPE_DATA, 0)) + (4096).to_bytes(2, "big")
+    assert decode(decoder, bogus + FRAMES[2]) == [FRAMES[2]]
+    assert decoder.rejected_frames == 1
+
+
+def test_largest_frame_accepted_by_default():
+    # 大家庭的 onHomeInfo 可以超过 32 KB，长度字段允许的最大帧都要接受
+    frame = push_frame("onHomeInfo", [{"deviceId": "x" * 100}] * 300)
+    assert len(frame) > 32 * 1024
+    padding = 0xFFFF - (len(frame) - HEADER_SIZE)
+    largest = push_frame("onHomeInfo", [{"deviceId": "x" * (100 + padding)}] + [{"deviceId": "x" * 100}] * 299)
+    assert len(largest) == HEADER_SIZE + 0xFFFF
+    decoder = FrameDecoder()
+    assert decode(decoder, frame, largest) == [frame, largest]
+    assert decoder.rejected_frames == 0
+
+
+def test_rejected_data_frames_counted():
+    decoder = FrameDecoder()
+    decode(decoder, encode_frame(TYPE_HEARTBEAT, b"{}") + encode_frame(TYPE_DATA, b"\x09\x01{}") + FRAMES[2])
+    assert decoder.rejected_frames == 2
+    assert decoder.rejected_data_frames == 1
+
+
+def test_heartbeat_with_body_rejected():
+    decoder = FrameDecoder()
+    assert decode(decoder, encode_frame(TYPE_HEARTBEAT, b"{}") + FRAMES[2]) == [FRAMES[2]]
+    assert decoder.rejected_frames == 1
+
+
+def test_request_flag_rejected_by_default():
+    request = bytes(encode_request(5, "a.b.c", {"x": 1}))
+    decoder = FrameDecoder()
+    assert decode(decoder, request + FRAMES[2]) == [FRAMES[2]]
+    assert decoder.rejected_frames >= 1
+
+
+def test_request_flag_accepted_with_data_flags():
+    request = bytes(encode_request(5, "a.b.c", {"x": 1}))
+    assert decode(FrameDecoder(data_flags=(FLAG_REQUEST,)), request) == [request]
+
+
+def test_unknown_flag_rejected():
+    bogus = encode_frame(TYPE_DATA, b"\x09\x01{}")
+    assert decode(FrameDecoder(), bogus + FRAMES[2]) == [FRAMES[2]]
+
+
+def test_json_end_mismatch_rejected():
+    # 长度字段多算了一个字节，整帧末尾不是 } 或 ]
+    frame = bytearray(response_frame(2, {"code": 200}))
+    frame[3] += 1
+    decoder = FrameDecoder()
+    assert decode(decoder, bytes(frame) + b"x" + FRAMES[2]) == [FRAMES[2]]
+    assert decoder.rejected_frames >= 1
+
+
+def test_json_start_mismatch_rejected():
+    bogus = encode_frame(TYPE_DATA, bytes((FLAG_RESPONSE, 1)) + b"xx}")
+    decoder = FrameDecoder()
+    assert decode(decoder, bogus + FRAMES[3]) == [FRAMES[3]]
+    assert decoder.rejected_frames >= 1
+
+
+def test_truncated_frame_does_not_swallow_next():
+    # 前一帧被截断，声明的长度会吞掉下一帧的开头
+    truncated = FRAMES[4][:-6]
+    assert decode(FrameDecoder(), truncated + FRAMES[2] + FRAMES[3]) == [FRAMES[2], FRAMES[3]]
+
+
+def test_buffer_cap_drops_oldest():
+    decoder = FrameDecoder(max_frame_size=64, max_buffer_size=128)
+    decoder.feed(b"\x00" * 1000)
+    assert len(decoder) <= 128
+    assert decode(decoder, FRAMES[2]) == [FRAMES[2]]
+
+
+def test_trailing_type_byte_kept():
+    decoder = FrameDecoder()
+    frame = FRAMES[2]
+    assert decode(decoder, b"garbage" + frame[:1]) == []
+    assert decode(decoder, frame[1:]) == [frame]
+
+
+def test_body_offset():
+    response = response_frame(300, {"code": 200})
+    assert response[body_offset(response):] == b'{"code": 200}'
+    push = push_frame("onHomeInfo", [])
+    assert push[body_offset(push):] == b"[]"
+    request = bytes(encode_request(1, "a.b", {}))
+    assert request[body_offset(request):] == b"{}"
+    assert body_offset(HEARTBEAT_FRAME) == HEADER_SIZE
+
+
+def test_response_code():
+    assert response_code(response_frame(1, {"code": 500})) == 500
+    assert response_code(push_frame("x", {"code": 200})) is None
+    assert response_code(encode_frame(TYPE_DATA, bytes((FLAG_RESPONSE, 1)) + b"{bad")) is None
@@ -0,0 +1,31 @@
+import asyncio
+
+from custom_components.gofullhanger.gf_client import GfClient
+from tools.gf_simulator import GfSimulator
+
+
+async def _rejected_login():
+    async with GfSimulator(accounts={"m": "p"}) as sim:
+        client = GfClient("127.0.0.1", sim.port, reconnect_initial=0.01, reconnect_max=0.01)
+        rejected = []
+        client.add_login_rejected_listener(lambda: rejected.append(True))
+        client.start("m", "bad", "c")
+        assert not await client.wait_for_session(5)
+        await asyncio.sleep(0.2)
+        attempts = sim.stats["connections"]
+        # 凭据不变时命令路径不会重新发起登录
+        client.start("m", "bad", "c")
+        await asyncio.sleep(0.1)
+        retried = sim.stats["connections"] - attempts
+        client.start("m", "p", "c")
+        logged_in = await client.wait_for_session(5)
+        await client.close()
+        return rejected, attempts, retried, logged_in
+
+
+def test_rejected_login_stops_reconnecting():
+    rejected, attempts, retried, logged_in = asyncio.run(_rejected_login())
+    assert rejected == [True]
+    assert attempts == 1
+    assert retried == 0
+    assert logged_in
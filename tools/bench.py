@@ -0,0 +1,332 @@
+"""GfClient 热路径基准测试。
+
+    python -m tools.bench                         # 运行全部基准
+    python -m tools.bench --only framing dispatch # 只运行部分基准
+    python -m tools.bench --save bench.json       # 保存为基线
+    python -m tools.bench --compare bench.json    # 与基线对比，退化超过阈值时返回非零
+
+每项基准报告 frames/s、µs/frame、每帧峰值分配字节数（tracemalloc），
+命令延迟类基准报告 p50/p99。
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from custom_components.gofullhanger.cover import GfCover
+from custom_components.gofullhanger.gf_client import GfClient
+from custom_components.gofullhanger.protocol import FrameDecoder
+from tools.benchutil import DEFAULT_THRESHOLD, compare_metrics, percentile
+from tools.gf_simulator import GfSimulator, build_home_info, encode_push, encode_response
+
+REMOTE_CONTROL_ROUTE = "main.userHandler.remoteControll"
+
+# 各指标的方向：True 表示越大越好
+METRIC_HIGHER_IS_BETTER = {
+    "frames_per_sec": True,
+    "us_per_frame": False,
+    "peak_bytes_per_frame": False,
+    "p50_ms": False,
+    "p99_ms": False,
+}
+
+
+def status_frame(device_id, position="4"):
+    return encode_push("onDeviceStatusData", {
+        "devices": [{"_id": device_id, "e_name": device_id, "props": {"status": "1", "position": position}}],
+    })
+
+
+def build_stream(frames, junk_every=0):
+    stream = bytearray()
+    for index, frame in enumerate(frames):
+        if junk_every and index % junk_every == 0:
+            stream += b"\xff\x05\x7b"
+        stream += frame
+    return bytes(stream)
+
+
+def measure(func, count):
+    """运行 func() 并返回 frames/s 与 µs/frame；func 处理 count 帧。"""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    return {
+        "frames_per_sec": count / elapsed if elapsed else float("inf"),
+        "us_per_frame": elapsed / count * 1e6,
+    }
+
+
+def peak_bytes_per_frame(step, count):
+    """逐帧测量处理期间的峰值分配字节数并取平均。"""
+    tracemalloc.start()
+    try:
+        total = 0
+        for index in range(count):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            step(index)
+            _, peak = tracemalloc.get_traced_memory()
+            total += peak - current
+    finally:
+        tracemalloc.stop()
+    return total / count
+
+
+async def make_hass():
+    from homeassistant.core import HomeAssistant
+
+    return HomeAssistant(tempfile.mkdtemp(prefix="gf-bench-"))
+
+
+class _FramingClient(GfClient):
+    # 只测量分帧，不解析消息内容
+    def process_complete_message(self, message):
+        self.frames += 1
+
+
+async def bench_framing(args, hass):
+    device_ids = [f"dev{i}" for i in range(32)]
+    frames = [status_frame(random.choice(device_ids)) for _ in range(args.frames)]
+    stream = build_stream(frames, junk_every=50)
+    results = {}
+    for chunk_size in (64, 512, 4096):
+        async def run():
+            client = _FramingClient("127.0.0.1", 0)
+            client.frames = 0
+            reader = asyncio.StreamReader(limit=2 ** 20)
+            for start in range(0, len(stream), chunk_size):
+                reader.feed_data(stream[start:start + chunk_size])
+            reader.feed_eof()
+            client.reader = reader
+            client.is_connection_closed = False
+            await client.receive_messages()
+            return client.frames
+
+        start = time.perf_counter()
+        count = await run()
+        elapsed = time.perf_counter() - start
+
+        decoder = FrameDecoder()
+        chunks = [stream[start:start + chunk_size] for start in range(0, len(stream), chunk_size)]
+        per_chunk = max(1, len(frames) // len(chunks))
+
+        def step(index):
+            decoder.feed(chunks[index % len(chunks)])
+            for _ in decoder:
+                pass
+
+        results[f"framing[{chunk_size}]"] = {
+            "frames_per_sec": count / elapsed,
+            "us_per_frame": elapsed / count * 1e6,
+            "peak_bytes_per_frame": peak_bytes_per_frame(step, min(len(chunks), 2000)) / per_chunk,
+        }
+    return results
+
+
+async def bench_dispatch(args, hass):
+    client = GfClient("127.0.0.1", 0)
+    home_info = build_home_info(1, 1, 4, 8)
+    client._process_on_home_info(home_info)
+    device_ids = [device["_id"] for device in client.devices_info]
+    frames = [
+        memoryview(status_frame(random.choice(device_ids), random.choice("01234")))
+        for _ in range(args.frames)
+    ]
+    response = memoryview(encode_response(1, {"code": 200, "codetxt": "ok"}))
+
+    def run_status():
+        for frame in frames:
+            client.process_complete_message(frame)
+
+    def run_response():
+        for _ in range(args.frames):
+            client.process_complete_message(response)
+
+    status = measure(run_status, len(frames))
+    status["peak_bytes_per_frame"] = peak_bytes_per_frame(
+        lambda i: client.process_complete_message(frames[i % len(frames)]), min(len(frames), 2000))
+    if hasattr(hass, "async_block_till_done"):
+        await hass.async_block_till_done()
+    reply = measure(run_response, args.frames)
+    reply["peak_bytes_per_frame"] = peak_bytes_per_frame(
+        lambda i: client.process_complete_message(response), min(args.frames, 2000))
+    return {"dispatch[status]": status, "dispatch[response]": reply}
+
+
+async def bench_encode(args, hass):
+    client = GfClient("127.0.0.1", 0)
+    data = {"deviceId": "5f0c1d2e3a4b5c6d7e8f9012", "props": [{"name": "putDown", "method": "set", "value": None}]}
+
+    def run():
+        for _ in range(args.frames):
+            client.generate_message(REMOTE_CONTROL_ROUTE, data)
+
+    result = measure(run, args.frames)
+    result["peak_bytes_per_frame"] = peak_bytes_per_frame(
+        lambda i: client.generate_message(REMOTE_CONTROL_ROUTE, data), min(args.frames, 2000))
+    return {"encode[remoteControll]": result}
+
+
+async def bench_command_latency(args, hass):
+    home_info = build_home_info(1, 1, 1, args.devices)
+    results = {}
+    async with GfSimulator(home_info=home_info, latency=args.latency, motion_interval=0.01, seed=1) as simulator:
+        client = GfClient("127.0.0.1", simulator.port)
+        if not await client.login("bench", "bench", "bench"):
+            raise RuntimeError("无法登录模拟服务器")
+        device_ids = [device["_id"] for device in client.devices_info]
+        try:
+            for concurrency in (1, len(device_ids)):
+                samples = []
+                loop = asyncio.get_running_loop()
+
+                async def one(device_id):
+                    started = loop.time()
+                    await client.remote_control("bench", "bench", "bench", device_id, 3)
+                    samples.append(loop.time() - started)
+
+                start = loop.time()
+                for _ in range(max(1, args.commands // concurrency)):
+                    await asyncio.gather(*(one(device_ids[i % len(device_ids)]) for i in range(concurrency)))
+                elapsed = loop.time() - start
+                results[f"command[concurrency={concurrency}]"] = {
+                    "frames_per_sec": len(samples) / elapsed,
+                    "us_per_frame": elapsed / len(samples) * 1e6,
+                    "p50_ms": percentile(samples, 0.5) * 1000,
+                    "p99_ms": percentile(samples, 0.99) * 1000,
+                }
+        finally:
+            await client.close()
+    return results
+
+
+class _BenchCover(GfCover):
+    # 只统计状态路由唤醒的实体数与状态写入次数，不真正写入状态机
+    wakeups = 0
+    writes = 0
+
+    def _handle_device_status_update(self, device):
+        _BenchCover.wakeups += 1
+        super()._handle_device_status_update(device)
+
+    def async_write_ha_state(self):
+        _BenchCover.writes += 1
+
+    async def async_get_last_state(self):
+        return None
+
+
+async def bench_fanout(args, hass):
+    results = {}
+    for entity_count in (1, 16, 128):
+        client = GfClient("127.0.0.1", 0)
+        client._process_on_home_info(build_home_info(1, 1, 1, entity_count))
+        config = {"mobile": "bench", "password": "bench", "clientid": "bench"}
+        entities = [_BenchCover(hass, info, client, config) for info in client.devices_info]
+        for entity in entities:
+            await entity.async_added_to_hass()
+        device_ids = [info["_id"] for info in client.devices_info]
+        frames = [memoryview(status_frame(random.choice(device_ids))) for _ in range(args.frames // 4)]
+        _BenchCover.wakeups = _BenchCover.writes = 0
+
+        start = time.perf_counter()
+        for frame in frames:
+            client.process_complete_message(frame)
+        if hasattr(hass, "async_block_till_done"):
+            await hass.async_block_till_done()
+        elapsed = time.perf_counter() - start
+
+        results[f"fanout[entities={entity_count}]"] = {
+            "frames_per_sec": len(frames) / elapsed,
+            "us_per_frame": elapsed / len(frames) * 1e6,
+            "wakeups_per_frame": _BenchCover.wakeups / len(frames),
+            "writes_per_frame": _BenchCover.writes / len(frames),
+        }
+        del entities
+    return results
+
+
+BENCHMARKS = {
+    "framing": bench_framing,
+    "dispatch": bench_dispatch,
+    "encode": bench_encode,
+    "command": bench_command_latency,
+    "fanout": bench_fanout,
+}
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        for metric, change in compare_metrics(metrics, base, METRIC_HIGHER_IS_BETTER, threshold, name):
+            regressions.append((name, metric, change))
+    return regressions
+
+
+def print_results(results):
+    for name, metrics in results.items():
+        values = "  ".join(f"{metric}={value:.2f}" for metric, value in metrics.items())
+        print(f"{name:32} {values}")
+
+
+async def run(args):
+    random.seed(args.seed)
+    # 分帧基准的输入流读完即断开，不输出客户端的断线日志
+    logging.getLogger("custom_components.gofullhanger").setLevel(logging.CRITICAL)
+    hass = await make_hass()
+    results = {}
+    for name in args.only or BENCHMARKS:
+        results.update(await BENCHMARKS[name](args, hass))
+    if hasattr(hass, "async_stop"):
+        await hass.async_stop(force=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GfClient 热路径基准测试")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS))
+    parser.add_argument("--frames", type=int, default=20000, help="每项基准处理的帧数")
+    parser.add_argument("--commands", type=int, default=200, help="命令延迟基准发送的命令数")
+    parser.add_argument("--devices", type=int, default=8, help="命令延迟基准的设备数")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟服务器的单帧延迟（秒）")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", metavar="FILE", help="把结果保存为基线")
+    parser.add_argument("--compare", metavar="FILE", help="与基线文件对比")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="允许的退化比例")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_results(results)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "results": results,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"基线已保存到 {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"与基线 {args.compare} 对比（阈值 {args.threshold:.0%}）:")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"发现 {len(regressions)} 项退化")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
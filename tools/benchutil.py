@@ -0,0 +1,31 @@
+"""bench.py 与 load.py 共用的统计与基线对比工具。"""
+
+# 与基线相比允许的退化比例
+DEFAULT_THRESHOLD = 0.2
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def compare_metrics(metrics, base, higher_is_better, threshold, name=""):
+    """按指标方向对比一组结果与基线，打印每项变化，返回 [(指标, 退化比例)]。
+
+    higher_is_better 为 {指标: True 表示越大越好}；基线中缺失或为 0 的指标跳过。
+    """
+    regressions = []
+    for metric, higher in higher_is_better.items():
+        if metric not in metrics or not base.get(metric):
+            continue
+        change = (metrics[metric] - base[metric]) / base[metric]
+        if higher:
+            change = -change
+        marker = ""
+        if change > threshold:
+            marker = "  <-- 退化"
+            regressions.append((metric, change))
+        label = f"{name:32} {metric:22}" if name else f"{metric:24}"
+        print(f"  {label} {base[metric]:12.2f} -> {metrics[metric]:12.2f} ({change:+.1%}){marker}")
+    return regressions
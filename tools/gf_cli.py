@@ -0,0 +1,82 @@
+"""不依赖 Home Assistant 的命令行客户端。
+
+    python -m tools.gf_cli -m 手机号 -p 密码 -c clientid devices
+    python -m tools.gf_cli -m 手机号 -p 密码 -c clientid watch
+    python -m tools.gf_cli -m 手机号 -p 密码 -c clientid control 设备ID put_down
+    python -m tools.gf_cli --host 127.0.0.1 -m a -p b -c c devices   # 连接本地模拟服务器
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+
+from custom_components.gofullhanger.const import HOST, OPERATIONS, PORT
+from custom_components.gofullhanger.gf_client import (
+    EVENT_CONNECTION,
+    EVENT_DEVICE_STATUS,
+    EVENT_DEVICES_CHANGED,
+    GfClient,
+)
+
+# 等待登录完成的时间（秒）
+LOGIN_TIMEOUT = 30
+
+
+async def run(args):
+    client = GfClient(args.host, args.port)
+    events = client.events()
+    client.start(args.mobile, args.password, args.clientid)
+    try:
+        if not await client.wait_for_session(LOGIN_TIMEOUT):
+            print("登录失败", file=sys.stderr)
+            return 1
+
+        if args.command == "devices":
+            print(json.dumps(client.devices_info, indent=2, ensure_ascii=False))
+        elif args.command == "control":
+            results = await client.control_many(
+                args.mobile, args.password, args.clientid, [(args.device_id, OPERATIONS[args.operation])]
+            )
+            print(json.dumps(results, ensure_ascii=False))
+            return 0 if all(results.values()) else 1
+        elif args.command == "watch":
+            async for event, data in events:
+                if event == EVENT_DEVICE_STATUS:
+                    print(f"{data['e_name']} ({data['_id']}): position={data['position']}")
+                elif event == EVENT_DEVICES_CHANGED:
+                    added, removed = data
+                    print(f"设备列表变化: 新增 {[d['_id'] for d in added]}, 移除 {[d['_id'] for d in removed]}")
+                elif event == EVENT_CONNECTION:
+                    print("已登录" if data else "连接已断开，等待重连")
+        return 0
+    finally:
+        await events.aclose()
+        await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="格峰晾衣架命令行客户端")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("-m", "--mobile", required=True)
+    parser.add_argument("-p", "--password", required=True)
+    parser.add_argument("-c", "--clientid", required=True)
+    parser.add_argument("--log-level", default="WARNING")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("devices", help="列出设备")
+    commands.add_parser("watch", help="持续输出设备状态变化")
+    control = commands.add_parser("control", help="控制单台设备")
+    control.add_argument("device_id")
+    control.add_argument("operation", choices=sorted(OPERATIONS))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        sys.exit(asyncio.run(run(args)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""格峰云端协议本地模拟服务器。
+
+用于在没有 main.ortron.cn 连接的环境下测试 GfClient 以及测量吞吐和延迟：
+
+    python -m tools.gf_simulator --port 13015 --homes 2 --devices 4 --latency 0.02
+
+支持握手、心跳、登录、onHomeInfo 推送、remoteControll 以及按时间推送的
+onDeviceStatusData 运动序列，并提供延迟、分片、合包和错误注入等参数。
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+
+from custom_components.gofullhanger.protocol import (
+    FLAG_PUSH,
+    FLAG_REQUEST,
+    FLAG_RESPONSE,
+    TYPE_DATA,
+    TYPE_HANDSHAKE,
+    TYPE_HANDSHAKE_ACK,
+    TYPE_HEARTBEAT,
+    FrameDecoder,
+    encode_frame,
+    encode_varint,
+    read_varint,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+LOGIN_ROUTE = "connector.userEntryHandler.login"
+REMOTE_CONTROL_ROUTE = "main.userHandler.remoteControll"
+
+# 客户端发往服务器的帧类型与数据帧标志
+CLIENT_FRAME_TYPES = (TYPE_HANDSHAKE, TYPE_HANDSHAKE_ACK, TYPE_HEARTBEAT, TYPE_DATA)
+CLIENT_DATA_FLAGS = (FLAG_REQUEST,)
+
+# 与 cover.py 一致的位置代码
+POSITION_STOPPED = "0"
+POSITION_CLOSED = "1"
+POSITION_OPENED = "2"
+POSITION_CLOSING = "3"
+POSITION_OPENING = "4"
+
+# 操作名 -> (运动中位置, 到位后位置)
+MOTIONS = {
+    "putDown": (POSITION_OPENING, POSITION_OPENED),
+    "raiseUp": (POSITION_CLOSING, POSITION_CLOSED),
+}
+
+
+def build_home_info(homes=1, layers=1, grids=1, devices=1):
+    """生成 homes -> layers -> homeGrids -> devices 结构的 onHomeInfo 内容。"""
+    home_list = []
+    index = 0
+    for h in range(homes):
+        layer_list = []
+        for l in range(layers):
+            grid_list = []
+            for g in range(grids):
+                device_list = []
+                for _ in range(devices):
+                    index += 1
+                    device_list.append({
+                        "_id": f"sim{index:05d}",
+                        "e_name": f"晾衣架{index}",
+                        "props": {"status": "1", "position": POSITION_CLOSED},
+                    })
+                grid_list.append({"_id": f"grid{h}-{l}-{g}", "devices": device_list})
+            layer_list.append({"_id": f"layer{h}-{l}", "homeGrids": grid_list})
+        home_list.append({"_id": f"home{h}", "name": f"家{h}", "layers": layer_list})
+    return {"homes": home_list}
+
+
+def encode_response(request_id, data):
+    body = bytes((FLAG_RESPONSE,)) + encode_varint(request_id)
+    body += json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return encode_frame(TYPE_DATA, body)
+
+
+def encode_push(route, data):
+    route_bytes = route.encode("utf-8")
+    body = bytes((FLAG_PUSH, len(route_bytes))) + route_bytes
+    body += json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return encode_frame(TYPE_DATA, body)
+
+
+def decode_request(frame):
+    """解析客户端请求帧，返回 (请求序号, 路由, JSON 内容)。"""
+    request_id, offset = read_varint(frame, 5)
+    route_length = frame[offset]
+    offset += 1
+    route = str(frame[offset:offset + route_length], "utf-8")
+    data = json.loads(bytes(frame[offset + route_length:]))
+    return request_id, route, data
+
+
+class GfSimulator:
+    def __init__(self, host="127.0.0.1", port=0, home_info=None, accounts=None,
+                 heartbeat=30, latency=0.0, jitter=0.0, fragment_size=0,
+                 coalesce_window=0.0, junk_rate=0.0, error_rate=0.0,
+                 heartbeat_drop_rate=0.0, motion_steps=3, motion_interval=0.5, seed=None):
+        self.host = host
+        self.port = port
+        self.home_info = home_info if home_info is not None else build_home_info()
+        # accounts 为 None 时接受任意账号
+        self.accounts = accounts
+        self.heartbeat = heartbeat
+        self.latency = latency
+        self.jitter = jitter
+        self.fragment_size = fragment_size
+        self.coalesce_window = coalesce_window
+        self.junk_rate = junk_rate
+        self.error_rate = error_rate
+        # 丢弃心跳应答的概率，用于模拟半开连接
+        self.heartbeat_drop_rate = heartbeat_drop_rate
+        self.motion_steps = motion_steps
+        self.motion_interval = motion_interval
+        self.random = random.Random(seed)
+        self.sessions = set()
+        self.stats = {"connections": 0, "frames_in": 0, "frames_out": 0, "bytes_out": 0}
+        self._server = None
+
+    @property
+    def devices(self):
+        for home in self.home_info.get("homes", []):
+            for layer in home.get("layers", []):
+                for grid in layer.get("homeGrids", []):
+                    yield from grid.get("devices", [])
+
+    def find_device(self, device_id):
+        for device in self.devices:
+            if device.get("_id") == device_id:
+                return device
+        return None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        _LOGGER.info("模拟服务器已启动 %s:%s", self.host, self.port)
+        return self
+
+    async def stop(self):
+        for session in list(self.sessions):
+            session.close()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _handle_connection(self, reader, writer):
+        session = _Session(self, reader, writer)
+        self.sessions.add(session)
+        self.stats["connections"] += 1
+        try:
+            await session.run()
+        finally:
+            self.sessions.discard(session)
+
+    def broadcast_status(self, device_id, position, status="1", mobile=None):
+        """向已登录连接推送一条设备状态；指定 mobile 时只推送给该账号的连接。"""
+        device = self.find_device(device_id)
+        if device is None:
+            return
+        device["props"]["position"] = position
+        device["props"]["status"] = status
+        frame = encode_push("onDeviceStatusData", {"devices": [device]})
+        for session in self.sessions:
+            if session.logged_in and (mobile is None or session.mobile == mobile):
+                session.send(frame)
+
+
+class _Session:
+    def __init__(self, server, reader, writer):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.logged_in = False
+        self.mobile = None
+        self._outbox = asyncio.Queue()
+        self._motions = {}
+        self._closed = False
+
+    def close(self):
+        self._closed = True
+        for task in self._motions.values():
+            task.cancel()
+        self.writer.close()
+
+    async def run(self):
+        writer_task = asyncio.create_task(self._write_loop())
+        decoder = FrameDecoder(CLIENT_FRAME_TYPES, data_flags=CLIENT_DATA_FLAGS)
+        try:
+            while not self._closed:
+                data = await self.reader.read(4096)
+                if not data:
+                    break
+                decoder.feed(data)
+                for frame in decoder:
+                    self.server.stats["frames_in"] += 1
+                    self._handle_frame(frame)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._closed = True
+            writer_task.cancel()
+            for task in self._motions.values():
+                task.cancel()
+            self.writer.close()
+
+    def send(self, frame):
+        loop = asyncio.get_running_loop()
+        due = loop.time() + self.server.latency
+        if self.server.jitter:
+            due += self.server.random.uniform(0, self.server.jitter)
+        self._outbox.put_nowait((due, frame))
+
+    async def _write_loop(self):
+        server = self.server
+        loop = asyncio.get_running_loop()
+        while True:
+            due, frame = await self._outbox.get()
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            chunks = [frame]
+            if server.coalesce_window:
+                # 合包：窗口内到期的帧拼成一次写入
+                await asyncio.sleep(server.coalesce_window)
+                while not self._outbox.empty():
+                    chunks.append(self._outbox.get_nowait()[1])
+            payload = bytearray()
+            for chunk in chunks:
+                if server.junk_rate and server.random.random() < server.junk_rate:
+                    payload += bytes(server.random.choice((0x00, 0x05, 0x7B, 0xFF))
+                                     for _ in range(server.random.randint(1, 8)))
+                payload += chunk
+            server.stats["frames_out"] += len(chunks)
+            server.stats["bytes_out"] += len(payload)
+            try:
+                if server.fragment_size:
+                    # 分片：按固定大小拆开写入，模拟 TCP 拆包
+                    for start in range(0, len(payload), server.fragment_size):
+                        self.writer.write(payload[start:start + server.fragment_size])
+                        await self.writer.drain()
+                else:
+                    self.writer.write(payload)
+                    await self.writer.drain()
+            except ConnectionError:
+                return
+
+    def _handle_frame(self, frame):
+        frame_type = frame[0]
+        if frame_type == TYPE_HANDSHAKE:
+            body = {"code": 200, "sys": {"heartbeat": self.server.heartbeat, "dict": {}, "protos": {}}}
+            self.send(encode_frame(TYPE_HANDSHAKE, json.dumps(body, separators=(",", ":")).encode("utf-8")))
+        elif frame_type == TYPE_HANDSHAKE_ACK:
+            self.send(encode_frame(TYPE_HEARTBEAT))
+        elif frame_type == TYPE_HEARTBEAT:
+            server = self.server
+            if server.heartbeat_drop_rate and server.random.random() < server.heartbeat_drop_rate:
+                return
+            self.send(encode_frame(TYPE_HEARTBEAT))
+        elif frame_type == TYPE_DATA:
+            try:
+                request_id, route, data = decode_request(frame)
+            except (ValueError, IndexError) as e:
+                _LOGGER.warning("无法解析请求帧: %s", e)
+                return
+            self._handle_request(request_id, route, data)
+
+    def _handle_request(self, request_id, route, data):
+        server = self.server
+        if server.error_rate and server.random.random() < server.error_rate:
+            self.send(encode_response(request_id, {"code": 500, "codetxt": "模拟错误"}))
+            return
+
+        if route == LOGIN_ROUTE:
+            accounts = server.accounts
+            if accounts is not None and accounts.get(data.get("mobile")) != data.get("password"):
+                self.send(encode_response(request_id, {"code": 401, "codetxt": "账号或密码错误"}))
+                return
+            self.logged_in = True
+            self.mobile = data.get("mobile")
+            self.send(encode_response(request_id, {"code": 200, "codetxt": "ok"}))
+            self.send(encode_push("onHomeInfo", server.home_info))
+            self.send(encode_push("onLoginInfoEnd", {"code": 200}))
+        elif route == REMOTE_CONTROL_ROUTE:
+            device_id = data.get("deviceId")
+            props = data.get("props") or [{}]
+            name = props[0].get("name")
+            if not self.logged_in or server.find_device(device_id) is None:
+                self.send(encode_response(request_id, {"code": 404, "codetxt": "设备不存在"}))
+                return
+            self.send(encode_response(request_id, {"code": 200, "codetxt": "ok"}))
+            self._start_motion(device_id, name)
+        else:
+            self.send(encode_response(request_id, {"code": 404, "codetxt": f"未知路由 {route}"}))
+
+    def _start_motion(self, device_id, name):
+        task = self._motions.pop(device_id, None)
+        if task is not None:
+            task.cancel()
+        if name == "stop":
+            self.server.broadcast_status(device_id, POSITION_STOPPED, mobile=self.mobile)
+            return
+        if name in MOTIONS:
+            self._motions[device_id] = asyncio.create_task(self._motion(device_id, *MOTIONS[name]))
+
+    async def _motion(self, device_id, moving, final):
+        server = self.server
+        # 运动过程中按间隔连续推送运动状态，最后推送到位状态；
+        # 与云端一致，只推送给下发命令的账号的连接
+        for _ in range(server.motion_steps):
+            server.broadcast_status(device_id, moving, mobile=self.mobile)
+            await asyncio.sleep(server.motion_interval)
+        server.broadcast_status(device_id, final, mobile=self.mobile)
+        self._motions.pop(device_id, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="格峰云端协议本地模拟服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=13015)
+    parser.add_argument("--home-info", help="onHomeInfo JSON 文件，不指定时按下列参数生成")
+    parser.add_argument("--homes", type=int, default=1)
+    parser.add_argument("--layers", type=int, default=1)
+    parser.add_argument("--grids", type=int, default=1)
+    parser.add_argument("--devices", type=int, default=2)
+    parser.add_argument("--heartbeat", type=int, default=30, help="握手下发的心跳间隔（秒）")
+    parser.add_argument("--latency", type=float, default=0.0, help="每帧固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="每帧随机附加延迟上限（秒）")
+    parser.add_argument("--fragment-size", type=int, default=0, help="按该字节数拆分写入，0 为不拆分")
+    parser.add_argument("--coalesce-window", type=float, default=0.0, help="合包窗口（秒）")
+    parser.add_argument("--junk-rate", type=float, default=0.0, help="帧前插入垃圾字节的概率")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="请求返回错误码的概率")
+    parser.add_argument("--heartbeat-drop-rate", type=float, default=0.0, help="丢弃心跳应答的概率")
+    parser.add_argument("--motion-steps", type=int, default=3)
+    parser.add_argument("--motion-interval", type=float, default=0.5)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    if args.home_info:
+        with open(args.home_info, encoding="utf-8") as f:
+            home_info = json.load(f)
+    else:
+        home_info = build_home_info(args.homes, args.layers, args.grids, args.devices)
+
+    logging.basicConfig(level=logging.INFO)
+    simulator = GfSimulator(
+        args.host, args.port, home_info,
+        heartbeat=args.heartbeat, latency=args.latency, jitter=args.jitter,
+        fragment_size=args.fragment_size, coalesce_window=args.coalesce_window,
+        junk_rate=args.junk_rate, error_rate=args.error_rate,
+        heartbeat_drop_rate=args.heartbeat_drop_rate,
+        motion_steps=args.motion_steps, motion_interval=args.motion_interval,
+        seed=args.seed,
+    )
+
+    async def run():
+        await simulator.start()
+        await simulator.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
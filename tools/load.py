@@ -0,0 +1,316 @@
+"""多会话负载测试：在同一进程内并发运行大量 GfClient 会话，测量客户端的扩展上限。
+
+    python -m tools.load                                     # 200 个会话，运行 30 秒
+    python -m tools.load --sessions 2000 --ramp 200 --duration 60
+    python -m tools.load --sessions-per-account 4            # 每个账号 4 个会话，共享状态推送
+    python -m tools.load --save load.json                    # 保存为基线
+    python -m tools.load --compare load.json                 # 与基线对比，退化超过阈值时返回非零
+
+会话按 --ramp 的速率连接到同进程的模拟服务器并登录，之后在 --duration 内
+按指数分布的间隔随机下发 putDown/raiseUp/stop，同时服务器定期向部分账号
+推送成批的设备状态。报告登录延迟、命令延迟（全部命令以及按会话中位数
+的分布）、状态推送送达延迟、事件循环延迟、每会话内存和每帧 CPU 时间。
+
+uvloop 可用时默认使用（--no-uvloop 关闭）；Python 3.11 起使用 asyncio.Runner，
+3.10 上退回 asyncio.run 加事件循环策略。模拟服务器与客户端运行在同一
+进程，内存与 CPU 数据包含服务器的开销；parse_us_mean 只统计客户端解析。
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+from custom_components.gofullhanger.const import OPERATION_PUT_DOWN, OPERATION_RAISE_UP, OPERATION_STOP
+from custom_components.gofullhanger.gf_client import GfClient
+from tools.benchutil import DEFAULT_THRESHOLD, compare_metrics, percentile
+from tools.gf_simulator import GfSimulator, build_home_info
+
+# 等待全部会话登录的时间（秒）
+LOGIN_TIMEOUT = 120
+# 事件循环延迟的采样间隔（秒）
+LAG_INTERVAL = 0.05
+
+# 命令组合：(操作, 权重)
+COMMAND_MIX = ((OPERATION_PUT_DOWN, 0.45), (OPERATION_RAISE_UP, 0.45), (OPERATION_STOP, 0.1))
+
+# 参与基线对比的指标及其方向：True 表示越大越好
+METRIC_HIGHER_IS_BETTER = {
+    "login_p99_ms": False,
+    "command_p50_ms": False,
+    "command_p99_ms": False,
+    "session_median_p99_ms": False,
+    "status_p99_ms": False,
+    "loop_lag_p99_ms": False,
+    "rss_kb_per_session": False,
+    "cpu_us_per_frame": False,
+    "frames_per_sec": True,
+}
+
+
+def summarize(prefix, samples, scale=1000):
+    """把秒为单位的样本汇总为 p50/p99/max（毫秒）。"""
+    if not samples:
+        return {f"{prefix}_count": 0}
+    return {
+        f"{prefix}_count": len(samples),
+        f"{prefix}_p50_ms": percentile(samples, 0.5) * scale,
+        f"{prefix}_p99_ms": percentile(samples, 0.99) * scale,
+        f"{prefix}_max_ms": max(samples) * scale,
+    }
+
+
+def rss_kb():
+    # Linux 上 ru_maxrss 单位为 KB，取峰值常驻内存
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def raise_fd_limit():
+    # 每个会话在客户端和服务器两端各占一个文件描述符
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+class LoadSession:
+    """一个负载会话：一个 GfClient 以及它的命令和状态延迟样本。"""
+
+    def __init__(self, host, port, mobile, burst_sent):
+        self.mobile = mobile
+        self.client = GfClient(host, port)
+        self.login_latency = None
+        self.command_latencies = []
+        self.command_failures = 0
+        self.status_latencies = []
+        self._burst_sent = burst_sent
+        self.client.add_status_listener(self._on_status)
+
+    def _on_status(self, device):
+        sent = self._burst_sent.get((self.mobile, device["_id"]))
+        if sent is not None:
+            self.status_latencies.append(asyncio.get_running_loop().time() - sent)
+
+    async def login(self):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        self.client.start(self.mobile, "load", "load")
+        if await self.client.wait_for_session(LOGIN_TIMEOUT):
+            self.login_latency = loop.time() - started
+        return self.login_latency is not None
+
+    async def drive(self, rng, device_ids, interval, deadline):
+        loop = asyncio.get_running_loop()
+        operations, weights = zip(*COMMAND_MIX)
+        while True:
+            delay = rng.expovariate(1 / interval)
+            if loop.time() + delay >= deadline:
+                return
+            await asyncio.sleep(delay)
+            operation = rng.choices(operations, weights)[0]
+            started = loop.time()
+            if await self.client.remote_control(self.mobile, "load", "load", rng.choice(device_ids), operation):
+                self.command_latencies.append(loop.time() - started)
+            else:
+                self.command_failures += 1
+
+
+async def monitor_loop_lag(samples):
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.append(loop.time() - started - LAG_INTERVAL)
+
+
+async def status_bursts(simulator, accounts, device_ids, args, rng, burst_sent, deadline):
+    # 每个间隔随机选取部分账号，一次推送该账号全部突发设备的状态
+    loop = asyncio.get_running_loop()
+    count = max(1, round(len(accounts) * args.burst_accounts))
+    while loop.time() + args.burst_interval < deadline:
+        await asyncio.sleep(args.burst_interval)
+        for mobile in rng.sample(accounts, count):
+            for device_id in device_ids:
+                burst_sent[(mobile, device_id)] = loop.time()
+                simulator.broadcast_status(device_id, rng.choice("1234"), mobile=mobile)
+
+
+def client_frames(sessions):
+    return sum(sum(session.client.metrics.frames_in.values()) for session in sessions)
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    raise_fd_limit()
+    # 上千个会话的连接日志没有意义，只保留警告以上
+    logging.getLogger("custom_components.gofullhanger").setLevel(logging.WARNING)
+
+    home_info = build_home_info(1, 1, 1, args.devices)
+    simulator = GfSimulator(home_info=home_info, motion_steps=args.motion_steps,
+                            motion_interval=args.motion_interval, seed=args.seed)
+    await simulator.start()
+    device_ids = [device["_id"] for device in simulator.devices]
+    # 设备一半用于命令、一半用于状态突发，避免运动推送干扰送达延迟的统计
+    command_devices = device_ids[:max(1, len(device_ids) // 2)]
+    burst_devices = device_ids[len(command_devices):] or device_ids
+
+    burst_sent = {}
+    accounts = [f"load{index:05d}" for index in range(max(1, args.sessions // args.sessions_per_account))]
+    sessions = [
+        LoadSession(simulator.host, simulator.port, accounts[index % len(accounts)], burst_sent)
+        for index in range(args.sessions)
+    ]
+    loop = asyncio.get_running_loop()
+    lag_samples = []
+    lag_task = asyncio.create_task(monitor_loop_lag(lag_samples))
+    try:
+        # 爬坡：按速率启动会话登录，测量内存增量
+        if args.tracemalloc:
+            tracemalloc.start()
+        traced_before = tracemalloc.get_traced_memory()[0] if args.tracemalloc else 0
+        rss_before = rss_kb()
+        started = loop.time()
+        logins = []
+        for session in sessions:
+            logins.append(asyncio.create_task(session.login()))
+            await asyncio.sleep(1 / args.ramp)
+        logged_in = sum(await asyncio.gather(*logins))
+        ramp_time = loop.time() - started
+        rss_after = rss_kb()
+        traced_after = tracemalloc.get_traced_memory()[0] if args.tracemalloc else 0
+        if args.tracemalloc:
+            tracemalloc.stop()
+        print(f"{logged_in}/{len(sessions)} 个会话在 {ramp_time:.1f}s 内登录，开始施加负载 {args.duration}s")
+
+        # 负载阶段：命令与状态突发混合，测量延迟与 CPU
+        del lag_samples[:]
+        frames_before = client_frames(sessions)
+        cpu_before = time.process_time()
+        started = loop.time()
+        deadline = started + args.duration
+        active = [session for session in sessions if session.login_latency is not None]
+        await asyncio.gather(
+            status_bursts(simulator, accounts, burst_devices, args, rng, burst_sent, deadline),
+            *(session.drive(random.Random(rng.random()), command_devices, args.command_interval, deadline)
+              for session in active),
+        )
+        elapsed = loop.time() - started
+        cpu = time.process_time() - cpu_before
+        frames = client_frames(sessions) - frames_before
+    finally:
+        lag_task.cancel()
+        await asyncio.gather(*(session.client.close() for session in sessions))
+        await simulator.stop()
+
+    login = [session.login_latency for session in sessions if session.login_latency is not None]
+    commands = [sample for session in sessions for sample in session.command_latencies]
+    medians = [percentile(session.command_latencies, 0.5) for session in sessions if session.command_latencies]
+    statuses = [sample for session in sessions for sample in session.status_latencies]
+    parse_count = sum(session.client.metrics.parse_time.count for session in sessions)
+    parse_total = sum(session.client.metrics.parse_time.total for session in sessions)
+
+    results = {
+        "sessions": len(sessions),
+        "accounts": len(accounts),
+        "logged_in": logged_in,
+        "ramp_s": ramp_time,
+        "command_failures": sum(session.command_failures for session in sessions),
+    }
+    results.update(summarize("login", login))
+    results.update(summarize("command", commands))
+    if medians:
+        results["session_median_p50_ms"] = percentile(medians, 0.5) * 1000
+        results["session_median_p99_ms"] = percentile(medians, 0.99) * 1000
+    results.update(summarize("status", statuses))
+    results.update(summarize("loop_lag", lag_samples))
+    results["rss_kb_per_session"] = (rss_after - rss_before) / len(sessions)
+    if args.tracemalloc:
+        results["traced_bytes_per_session"] = (traced_after - traced_before) / len(sessions)
+    results["frames_in"] = frames
+    results["frames_per_sec"] = frames / elapsed if elapsed else 0.0
+    results["cpu_us_per_frame"] = cpu / frames * 1e6 if frames else 0.0
+    results["parse_us_mean"] = parse_total / parse_count * 1e6 if parse_count else 0.0
+    return results
+
+
+def compare(results, baseline, threshold):
+    return compare_metrics(results, baseline.get("results", {}), METRIC_HIGHER_IS_BETTER, threshold)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GfClient 多会话负载测试")
+    parser.add_argument("--sessions", type=int, default=200, help="并发会话数")
+    parser.add_argument("--sessions-per-account", type=int, default=1, help="每个账号的会话数")
+    parser.add_argument("--ramp", type=float, default=100, help="每秒启动的会话数")
+    parser.add_argument("--duration", type=float, default=30, help="负载阶段时长（秒）")
+    parser.add_argument("--devices", type=int, default=8, help="每个账号的设备数")
+    parser.add_argument("--command-interval", type=float, default=5.0, help="每个会话的平均命令间隔（秒）")
+    parser.add_argument("--burst-interval", type=float, default=1.0, help="状态突发的间隔（秒）")
+    parser.add_argument("--burst-accounts", type=float, default=0.1, help="每次突发涉及的账号比例")
+    parser.add_argument("--motion-steps", type=int, default=3)
+    parser.add_argument("--motion-interval", type=float, default=0.5)
+    parser.add_argument("--tracemalloc", action="store_true", help="爬坡阶段用 tracemalloc 统计每会话分配（会拖慢登录）")
+    parser.add_argument("--no-uvloop", action="store_true", help="即使已安装 uvloop 也使用默认事件循环")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", metavar="FILE", help="把结果保存为基线")
+    parser.add_argument("--compare", metavar="FILE", help="与基线文件对比")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="允许的退化比例")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    loop_factory = None if args.no_uvloop or uvloop is None else uvloop.new_event_loop
+    print(f"事件循环: {'uvloop' if loop_factory else 'asyncio'}")
+    if sys.version_info >= (3, 11):
+        with asyncio.Runner(loop_factory=loop_factory) as runner:
+            results = runner.run(run(args))
+    else:
+        # Python 3.10 没有 asyncio.Runner，改为通过事件循环策略选择 uvloop
+        if loop_factory:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "loop": "uvloop" if loop_factory else "asyncio",
+                "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "args": vars(args),
+                "results": results,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"基线已保存到 {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"与基线 {args.compare} 对比（阈值 {args.threshold:.0%}）:")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"发现 {len(regressions)} 项退化")
+            sys.exit(1)
+    if results["logged_in"] < results["sessions"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
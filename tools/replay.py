@@ -0,0 +1,108 @@
+"""抓包回放：把抓包文件中的入站字节流按原始分片送进 GfClient.receive_messages。
+
+    python -m tools.replay capture.gfcap              # 尽快回放并报告吞吐
+    python -m tools.replay capture.gfcap --realtime   # 按抓包时的时间间隔回放
+    python -m tools.replay capture.gfcap --speed 10   # 以 10 倍速回放
+
+抓包文件由集成选项中的“协议抓包”生成（见 capture.py），回放不需要连接云端。
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from custom_components.gofullhanger.capture import read_capture
+from custom_components.gofullhanger.gf_client import GfClient
+from custom_components.gofullhanger.trace import DIRECTION_IN
+
+
+class _CaptureReader:
+    # 代替 StreamReader：每次 read 返回抓包中的一个原始分片，保持分片边界
+    def __init__(self, client, chunks, speed=None):
+        self._client = client
+        self._chunks = chunks
+        self._index = 0
+        self._pending = b""
+        self._speed = speed
+        self._started = None
+
+    async def read(self, n):
+        if not self._pending:
+            if self._index >= len(self._chunks):
+                return b""
+            offset, self._pending = self._chunks[self._index]
+            self._index += 1
+            if self._speed:
+                loop = asyncio.get_running_loop()
+                if self._started is None:
+                    self._started = loop.time() - offset / self._speed
+                delay = self._started + offset / self._speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+        data, self._pending = self._pending[:n], self._pending[n:]
+        if not self._pending and self._index >= len(self._chunks):
+            # 最后一个分片处理完后让接收循环正常退出，而不是当作服务器断开
+            self._client.should_exit = True
+        return data
+
+
+async def replay(path, speed=None):
+    started_at, records = read_capture(path)
+    chunks = [(offset, data) for direction, offset, data in records if direction == DIRECTION_IN]
+    client = GfClient("replay", 0)
+    status_updates = 0
+
+    def count_status(device):
+        nonlocal status_updates
+        status_updates += 1
+
+    # 设备出现后为其订阅状态，用于统计状态更新次数
+    def subscribe(added, removed):
+        for device in added:
+            client.subscribe_device(device["_id"], count_status)
+
+    client.add_devices_listener(subscribe)
+    client.reader = _CaptureReader(client, chunks, speed)
+    client.is_connection_closed = False
+
+    start = time.perf_counter()
+    await client.receive_messages()
+    elapsed = time.perf_counter() - start
+
+    metrics = client.metrics.snapshot()
+    frames = sum(client.metrics.frames_in.values())
+    return {
+        "capture": path,
+        "captured_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(started_at)),
+        "duration_s": round(chunks[-1][0] - chunks[0][0], 3) if chunks else 0,
+        "chunks": len(chunks),
+        "bytes": metrics["bytes_in"],
+        "frames": frames,
+        "skipped_bytes": metrics["skipped_bytes"],
+        "status_updates": status_updates,
+        "devices": len(client.devices),
+        "elapsed_s": round(elapsed, 3),
+        "frames_per_sec": round(frames / elapsed, 1) if elapsed else None,
+        "frames_in": metrics["frames_in"],
+        "parse_time_us": metrics["parse_time_us"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GfClient 抓包回放")
+    parser.add_argument("capture", help="抓包文件路径")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--realtime", action="store_true", help="按抓包时的时间间隔回放")
+    group.add_argument("--speed", type=float, help="按指定倍速回放")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    speed = 1.0 if args.realtime else args.speed
+    result = asyncio.run(replay(args.capture, speed))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
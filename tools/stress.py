@@ -0,0 +1,211 @@
+"""FrameDecoder 压力测试：在对抗性的分片和垃圾数据下检查内存是否平稳、吞吐是否稳定。
+
+    python -m tools.stress                          # 默认参数
+    python -m tools.stress --garbage 0.3 --max-fragment 1 --frames 50000
+
+数据流由合法帧与多种垃圾交错组成：随机字节、声明超长长度的伪帧头、
+带内容的伪心跳帧、成串的帧起始标记以及被截断的合法帧。数据流按随机
+大小分片喂给解码器，分成若干窗口分别统计吞吐与内存，并单独解码一遍
+核对交出的帧：不得出现合法帧以外的帧，按顺序找回的合法帧比例不得低于
+下限。任一检查不通过时返回非零。
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from custom_components.gofullhanger.protocol import (
+    MAX_BUFFER_SIZE,
+    MAX_FRAME_SIZE,
+    TYPE_DATA,
+    TYPE_HEARTBEAT,
+    FrameDecoder,
+    body_offset,
+    encode_frame,
+    loads,
+)
+from tools.gf_simulator import encode_push, encode_response
+
+# 内存检查：预热窗口之后 tracemalloc 当前值的最大波动（字节）
+DEFAULT_MEMORY_TOLERANCE = 256 * 1024
+# 吞吐检查：最慢窗口不得低于中位数的这一比例
+DEFAULT_THROUGHPUT_RATIO = 0.5
+# 正确性检查：按顺序找回的合法帧比例下限
+DEFAULT_MIN_RECOVERY = 0.95
+
+
+def valid_frames(rng, count):
+    frames = []
+    for index in range(count):
+        kind = rng.random()
+        if kind < 0.7:
+            frames.append(encode_push("onDeviceStatusData", {
+                "devices": [{"_id": f"dev{rng.randrange(64)}", "props": {"status": "1", "position": rng.choice("01234")}}],
+            }))
+        elif kind < 0.9:
+            frames.append(encode_response(index % 0xFFFF + 1, {"code": 200, "codetxt": "ok"}))
+        elif kind < 0.99:
+            frames.append(encode_frame(TYPE_HEARTBEAT))
+        else:
+            # 偶尔出现的大帧，类似设备较多时的 onHomeInfo
+            frames.append(encode_push("onHomeInfo", {"padding": "x" * rng.randrange(2000, 8000)}))
+    return frames
+
+
+def garbage(rng, frames):
+    kind = rng.randrange(5)
+    if kind == 0:
+        return bytes(rng.randrange(256) for _ in range(rng.randrange(1, 32)))
+    if kind == 1:
+        # 声明超长长度的伪帧头
+        return bytes((TYPE_DATA, 0, 0xFF, rng.randrange(256)))
+    if kind == 2:
+        # 带内容的伪心跳帧头
+        return bytes((TYPE_HEARTBEAT, 0, 0, rng.randrange(1, 256)))
+    if kind == 3:
+        return bytes((TYPE_DATA, 0)) * rng.randrange(1, 16)
+    # 被截断的合法帧
+    frame = rng.choice(frames)
+    return frame[:rng.randrange(1, len(frame))]
+
+
+def build_stream(rng, frames, garbage_rate):
+    stream = bytearray()
+    for frame in frames:
+        if rng.random() < garbage_rate:
+            stream += garbage(rng, frames)
+        stream += frame
+    return bytes(stream)
+
+
+def fragment(rng, stream, max_fragment):
+    chunks = []
+    position = 0
+    while position < len(stream):
+        size = rng.randint(1, max_fragment)
+        chunks.append(stream[position:position + size])
+        position += size
+    return chunks
+
+
+def run_windows(chunks, windows, max_frame_size, max_buffer_size, track_memory):
+    decoder = FrameDecoder(max_frame_size=max_frame_size, max_buffer_size=max_buffer_size)
+    per_window = max(1, len(chunks) // windows)
+    results = []
+    frames = 0
+    max_buffered = 0
+    if track_memory:
+        tracemalloc.start()
+    try:
+        for start in range(0, len(chunks), per_window):
+            window_frames = 0
+            started = time.perf_counter()
+            for chunk in chunks[start:start + per_window]:
+                decoder.feed(chunk)
+                for _ in decoder:
+                    window_frames += 1
+                if len(decoder) > max_buffered:
+                    max_buffered = len(decoder)
+            elapsed = time.perf_counter() - started
+            frames += window_frames
+            result = {"frames": window_frames, "frames_per_sec": window_frames / elapsed if elapsed else 0.0}
+            if track_memory:
+                result["memory"] = tracemalloc.get_traced_memory()[0]
+            results.append(result)
+    finally:
+        if track_memory:
+            tracemalloc.stop()
+    return decoder, frames, max_buffered, results
+
+
+def verify(chunks, frames, max_frame_size, max_buffer_size):
+    """解码一遍并与合法帧序列比对，返回 (按顺序找回的合法帧数, 伪帧数, 损坏帧数)。
+
+    交出的帧应是合法帧序列中当前位置之后的某一帧。截断的合法帧可能吞掉
+    后续数据而恰好通过帧头和 JSON 首尾检查，这类帧的 JSON 无法解析，
+    客户端解析时会丢弃，计为损坏帧；JSON 能够解析却不是合法帧的计为伪帧。
+    """
+    decoder = FrameDecoder(max_frame_size=max_frame_size, max_buffer_size=max_buffer_size)
+    position = 0
+    recovered = 0
+    spurious = 0
+    corrupt = 0
+    for chunk in chunks:
+        decoder.feed(chunk)
+        for frame in decoder:
+            frame = bytes(frame)
+            for index in range(position, len(frames)):
+                if frames[index] == frame:
+                    position = index + 1
+                    recovered += 1
+                    break
+            else:
+                try:
+                    loads(frame[body_offset(frame):])
+                    spurious += 1
+                except ValueError:
+                    corrupt += 1
+    return recovered, spurious, corrupt
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FrameDecoder 压力测试")
+    parser.add_argument("--frames", type=int, default=100000, help="合法帧数量")
+    parser.add_argument("--garbage", type=float, default=0.1, help="每个合法帧前插入垃圾的概率")
+    parser.add_argument("--max-fragment", type=int, default=256, help="单次喂入的最大字节数")
+    parser.add_argument("--windows", type=int, default=20, help="统计窗口数")
+    parser.add_argument("--max-frame-size", type=int, default=MAX_FRAME_SIZE)
+    parser.add_argument("--max-buffer-size", type=int, default=MAX_BUFFER_SIZE)
+    parser.add_argument("--memory-tolerance", type=int, default=DEFAULT_MEMORY_TOLERANCE)
+    parser.add_argument("--throughput-ratio", type=float, default=DEFAULT_THROUGHPUT_RATIO)
+    parser.add_argument("--min-recovery", type=float, default=DEFAULT_MIN_RECOVERY, help="合法帧找回比例下限")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    frames = valid_frames(rng, args.frames)
+    stream = build_stream(rng, frames, args.garbage)
+    chunks = fragment(rng, stream, args.max_fragment)
+    print(f"数据流 {len(stream)} 字节，{len(frames)} 个合法帧，{len(chunks)} 个分片")
+
+    # 吞吐与内存分两轮测量，避免 tracemalloc 的开销影响吞吐数据
+    decoder, decoded, max_buffered, timing = run_windows(
+        chunks, args.windows, args.max_frame_size, args.max_buffer_size, track_memory=False)
+    _, _, _, memory = run_windows(
+        chunks, args.windows, args.max_frame_size, args.max_buffer_size, track_memory=True)
+    recovered, spurious, corrupt = verify(chunks, frames, args.max_frame_size, args.max_buffer_size)
+    recovery = recovered / len(frames)
+
+    rates = [window["frames_per_sec"] for window in timing if window["frames"]]
+    median = statistics.median(rates)
+    samples = [window["memory"] for window in memory[1:]] or [memory[0]["memory"]]
+    growth = max(samples) - min(samples)
+
+    print(f"解出帧 {decoded}（合法帧 {len(frames)}），跳过 {decoder.skipped_bytes} 字节，"
+          f"拒绝帧头 {decoder.rejected_frames} 个，缓冲区峰值 {max_buffered} 字节")
+    print(f"吞吐 frames/s: 中位数 {median:.0f}，最低 {min(rates):.0f}，最高 {max(rates):.0f}")
+    print(f"内存: 预热后波动 {growth} 字节（{min(samples)} ~ {max(samples)}）")
+    print(f"正确性: 按顺序找回合法帧 {recovered}（{recovery:.1%}），伪帧 {spurious}，JSON 损坏的帧 {corrupt}")
+
+    failures = []
+    if max_buffered > args.max_buffer_size:
+        failures.append(f"缓冲区峰值 {max_buffered} 超过上限 {args.max_buffer_size}")
+    if growth > args.memory_tolerance:
+        failures.append(f"内存波动 {growth} 超过容差 {args.memory_tolerance}")
+    if min(rates) < median * args.throughput_ratio:
+        failures.append(f"最低吞吐低于中位数的 {args.throughput_ratio:.0%}")
+    if spurious:
+        failures.append(f"解出 {spurious} 个伪帧")
+    if recovery < args.min_recovery:
+        failures.append(f"合法帧找回比例 {recovery:.1%} 低于下限 {args.min_recovery:.0%}")
+    for failure in failures:
+        print(f"失败: {failure}")
+    if failures:
+        sys.exit(1)
+    print("通过")
+
+
+if __name__ == "__main__":
+    main()